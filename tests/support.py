@@ -0,0 +1,16 @@
+"""Loads wireless-explorer.py as a module, its file name isn't importable"""
+import importlib.util
+import os
+import sys
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wireless-explorer.py')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def load_wireless_explorer():
+    module = sys.modules.get('wireless_explorer')
+    if module is None:
+        spec = importlib.util.spec_from_file_location('wireless_explorer', SCRIPT_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['wireless_explorer'] = module
+        spec.loader.exec_module(module)
+    return module
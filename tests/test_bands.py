@@ -0,0 +1,36 @@
+import unittest
+
+from support import load_wireless_explorer
+
+wx = load_wireless_explorer()
+
+def network(bssid, frequency, signal=-50):
+    return wx.Network(bssid, 'Net', 0, frequency, 20, signal, 'wlan0')
+
+class GroupNetworksByBandTest(unittest.TestCase):
+    def test_placeholder_tab_is_not_a_band(self):
+        networks = [network('00:00:00:00:00:01', 2412), network('00:00:00:00:00:02', 5180)]
+        self.assertEqual(wx.group_networks_by_band(networks, ['(loading...)']), {})
+        grouped = wx.group_networks_by_band(networks, ['5 GHz', 'Error'])
+        self.assertEqual(list(grouped), ['5 GHz'])
+        self.assertEqual([n.bssid for n in grouped['5 GHz']], ['00:00:00:00:00:02'])
+
+class SixGhzTest(unittest.TestCase):
+    def test_band_edges(self):
+        self.assertEqual(wx.get_frequency_band(5885), '5 GHz')
+        for channel in (1, 5, 233):
+            self.assertEqual(wx.get_frequency_band(wx.CANDIDATE_CHANNELS['6 GHz'][channel]), '6 GHz')
+
+    def test_candidates_are_grouped_into_their_band(self):
+        for band, channels in wx.CANDIDATE_CHANNELS.items():
+            for frequency in channels.values():
+                self.assertEqual(wx.get_frequency_band(frequency), band)
+
+    def test_busy_edge_channel_isnt_best(self):
+        networks = wx.group_networks_by_band([network('00:00:00:00:00:01', 7115, signal=-30)])
+        self.assertEqual(len(networks['6 GHz']), 1)
+        congestion = wx.ChannelCongestion('6 GHz', networks['6 GHz'])
+        self.assertNotIn(233, [score[0] for score in congestion.best_channels()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from support import load_wireless_explorer
+
+wx = load_wireless_explorer()
+
+try:
+    import cairo
+except ImportError:
+    cairo = None
+
+@unittest.skipUnless(cairo, "needs pycairo")
+class CairoSpectrumRendererTest(unittest.TestCase):
+    WIDTH, HEIGHT = 600, 300
+
+    def setUp(self):
+        wx.cairo = cairo
+        self.renderer = wx.CairoSpectrumRenderer()
+        self.surface = cairo.ImageSurface(cairo.FORMAT_RGB24, self.WIDTH, self.HEIGHT)
+        # Whole pixels only, so colors can be compared exactly
+        self.cr = cairo.Context(self.surface)
+        self.cr.set_antialias(cairo.ANTIALIAS_NONE)
+
+    def pixel(self, x, y):
+        self.surface.flush()
+        offset = int(y) * self.surface.get_stride() + int(x) * 4
+        blue, green, red = self.surface.get_data()[offset:offset + 3]
+        return red, green, blue
+
+    def test_draws_outlines_and_highlight(self):
+        networks = [wx.Network('00:00:00:00:00:01', '(hidden)', 1, 2412, 20, -40, 'wlan0'),
+                    wx.Network('00:00:00:00:00:02', 'Guest', 11, 2462, 20, -60, 'wlan0')]
+        self.renderer.draw(self.cr, self.WIDTH, self.HEIGHT, networks, networks[1].bssid, -100)
+
+        self.cr.select_font_face("sans-serif", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        self.cr.set_font_size(self.renderer.FONT_SIZE)
+        geometry = self.renderer.compute_geometry(self.cr, networks, -100, self.WIDTH, self.HEIGHT)
+        ruler_y = geometry['ruler'][2]
+
+        self.assertEqual(self.pixel(2, 2), (0, 0, 0))
+        _, top_left, top_right, _, top_y = geometry['trapezoids'][0]
+        self.assertEqual(self.pixel((top_left + top_right) // 2, top_y), wx.NETWORK_COLORS[0])
+
+        # Selected network is filled with its color at 80/255 opacity
+        _, top_left, top_right, _, top_y = geometry['trapezoids'][1]
+        fill = self.pixel((top_left + top_right) // 2, (top_y + ruler_y) // 2)
+        for channel, color in zip(fill, wx.NETWORK_COLORS[1]):
+            self.assertAlmostEqual(channel, color * 80 / 255, delta=2)
+
+    def test_empty_list(self):
+        self.renderer.draw(self.cr, self.WIDTH, self.HEIGHT, [], None, -100)
+        self.surface.flush()
+        self.assertTrue(any(self.surface.get_data()))
+
+if __name__ == '__main__':
+    unittest.main()
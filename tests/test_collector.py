@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from support import SCRIPT_PATH, load_wireless_explorer
+
+wx = load_wireless_explorer()
+
+class CollectorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.address = 'unix:' + os.path.join(self.directory.name, 'wx.sock')
+        self.collectors = []
+
+    def tearDown(self):
+        # Collector threads are daemons, only stop accepting sensors
+        for collector in self.collectors:
+            collector.loop.call_soon_threadsafe(collector.server.close)
+        self.directory.cleanup()
+
+    def write_log(self, name, scans):
+        path = os.path.join(self.directory.name, f'{name}.log')
+        writer = wx.ScanLogWriter(path)
+        for i, networks in enumerate(scans):
+            writer.append(1000.0 + i, networks)
+        writer.close()
+        return path
+
+    def run_sensor(self, name, log_path):
+        subprocess.run([sys.executable, SCRIPT_PATH, '--headless', '--replay', log_path, '--replay-speed', '0',
+                        '--publish', self.address, '--sensor-name', name],
+                       check=True, capture_output=True, timeout=30)
+
+    def test_merges_replaying_sensors(self):
+        backend = wx.CollectorBackend(self.address)
+        self.collectors.append(backend.collector)
+        home = '00:11:22:33:44:55'
+        self.run_sensor('a', self.write_log('a', [
+            [wx.Network(home, 'HomeNet', 1, 2412, 20, -70, 'wlan0')],
+            [wx.Network(home, 'HomeNet', 1, 2412, 20, -60, 'wlan0')],
+        ]))
+        self.run_sensor('b', self.write_log('b', [
+            [wx.Network(home, 'HomeNet', 1, 2412, 20, -40, 'wlan1'),
+             wx.Network('66:77:88:99:aa:bb', 'Guest', 36, 5180, 80, -55, 'wlan1')],
+        ]))
+
+        networks = {network.bssid: network for network in backend.scan(wx.CollectorBackend.DEVICE)}
+        self.assertEqual(len(networks), 2)
+        # Strongest observation wins, latest scan of every sensor counts
+        self.assertEqual(networks[home].signal, -40)
+        self.assertEqual(networks[home].device, 'b/wlan1')
+        self.assertEqual(networks[home].seen_by, ['a', 'b'])
+        self.assertEqual(networks['66:77:88:99:aa:bb'].seen_by, ['b'])
+
+    def test_drops_oldest_scans_while_collector_is_down(self):
+        publisher = wx.SensorPublisher(self.address, 'a', max_queue=2)
+        try:
+            for signal in range(-80, -30, 10):
+                publisher.publish(1000.0, [wx.Network('00:11:22:33:44:55', 'HomeNet', 1, 2412, 20, signal, 'wlan0')])
+            deadline = time.monotonic() + 5
+            while publisher.counters['dropped'] < 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(publisher.counters['dropped'], 3)
+
+            # Kept scans are sent once the collector is up, after a retry
+            collector = wx.SensorCollector(self.address)
+            self.collectors.append(collector)
+            deadline = time.monotonic() + 10
+            while collector.generation < 2 and time.monotonic() < deadline:
+                collector.wait(collector.generation, 1)
+            self.assertEqual(collector.generation, 2)
+            _, latest = collector.snapshot(60)
+            self.assertEqual([(sensor, networks[0].signal) for sensor, networks in latest], [('a', -40)])
+        finally:
+            publisher.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import errno
+import socket
+import struct
+import unittest
+
+from support import load_wireless_explorer
+
+wx = load_wireless_explorer()
+
+from wireless_explorer import (  # noqa: E402, module is loaded above
+    CTRL_ATTR_FAMILY_ID, CTRL_ATTR_FAMILY_NAME, CTRL_ATTR_MCAST_GROUPS, CTRL_ATTR_MCAST_GRP_ID,
+    CTRL_ATTR_MCAST_GRP_NAME, CTRL_CMD_GETFAMILY, GENL_ID_CTRL, NL80211_ATTR_BSS,
+    NL80211_ATTR_IFINDEX, NL80211_ATTR_IFNAME, NL80211_ATTR_SCAN_FREQUENCIES, NL80211_ATTR_WIPHY,
+    NL80211_ATTR_WIPHY_BANDS, NL80211_BAND_ATTR_FREQS, NL80211_BSS_BSSID, NL80211_BSS_FREQUENCY,
+    NL80211_BSS_INFORMATION_ELEMENTS, NL80211_BSS_SIGNAL_MBM, NL80211_CMD_GET_INTERFACE,
+    NL80211_CMD_GET_SCAN, NL80211_CMD_GET_WIPHY, NL80211_CMD_NEW_INTERFACE,
+    NL80211_CMD_NEW_SCAN_RESULTS, NL80211_CMD_NEW_WIPHY, NL80211_CMD_TRIGGER_SCAN,
+    NL80211_FREQUENCY_ATTR_DISABLED, NL80211_FREQUENCY_ATTR_FREQ, NLMSG_DONE, NLMSG_ERROR,
+    NLM_F_DUMP, NLM_F_MULTI, nla_iter, nla_nested, nla_pack, nla_parse, nlmsg_iter, nlmsg_pack,
+)
+
+class FakeNetlinkSocket:
+    """In-memory stand-in for NetlinkSocket that emulates nl80211.
+
+    interfaces is {ifname: (ifindex, wiphy)}, wiphy_freqs is
+    {wiphy: [(freq, disabled), ...]} and bss_list is a list of dicts with
+    'bssid' (bytes), 'frequency', 'signal_mbm' and 'ies' (bytes) keys.
+    Lets Nl80211Backend be exercised without Wi-Fi hardware. Every band
+    of a wiphy comes in a message of its own, as in split dumps. With
+    complete_scans=False triggered scans never finish.
+    """
+    FAMILY_ID = 0x1c
+    SCAN_GROUP_ID = 5
+
+    def __init__(self, interfaces, wiphy_freqs, bss_list, scan_error=0, complete_scans=True):
+        self.interfaces = interfaces
+        self.wiphy_freqs = wiphy_freqs
+        self.bss_list = bss_list
+        self.scan_error = scan_error
+        self.complete_scans = complete_scans
+        # Frequencies of every triggered scan, None if not restricted
+        self.triggered = []
+        self.groups = set()
+        self.pending = []
+
+    def send(self, data):
+        for msg_type, flags, seq, payload in nlmsg_iter(data):
+            cmd, attrs = payload[0], nla_parse(payload[4:])
+            replies, error = self.handle(msg_type, cmd, attrs)
+            for reply_cmd, reply_attrs in replies:
+                self.pending.append(nlmsg_pack(msg_type, NLM_F_MULTI, seq, reply_cmd, reply_attrs))
+            if flags & NLM_F_DUMP == NLM_F_DUMP and not error:
+                self.pending.append(struct.pack('=IHHIIi', 20, NLMSG_DONE, NLM_F_MULTI, seq, 0, 0))
+            else:
+                self.pending.append(struct.pack('=IHHIIi', 36, NLMSG_ERROR, 0, seq, 0, -error) + data[:16])
+            if msg_type == self.FAMILY_ID and cmd == NL80211_CMD_TRIGGER_SCAN and not error \
+                    and self.complete_scans and self.SCAN_GROUP_ID in self.groups:
+                self.pending.append(self.scan_event(attrs[NL80211_ATTR_IFINDEX]))
+
+    def scan_event(self, ifindex_payload):
+        """Returns NEW_SCAN_RESULTS multicast event of an interface"""
+        return nlmsg_pack(self.FAMILY_ID, 0, 0, NL80211_CMD_NEW_SCAN_RESULTS,
+                          [nla_pack(NL80211_ATTR_IFINDEX, ifindex_payload)])
+
+    def handle(self, msg_type, cmd, attrs):
+        """Returns ([(cmd, attrs), ...], errno) for a request"""
+        if msg_type == GENL_ID_CTRL and cmd == CTRL_CMD_GETFAMILY:
+            if attrs.get(CTRL_ATTR_FAMILY_NAME) != b'nl80211\0':
+                return [], errno.ENOENT
+            group = nla_nested(1, [nla_pack(CTRL_ATTR_MCAST_GRP_NAME, b'scan\0'),
+                                   nla_pack(CTRL_ATTR_MCAST_GRP_ID, struct.pack('=I', self.SCAN_GROUP_ID))])
+            return [(CTRL_CMD_GETFAMILY, [nla_pack(CTRL_ATTR_FAMILY_ID, struct.pack('=H', self.FAMILY_ID)),
+                                          nla_nested(CTRL_ATTR_MCAST_GROUPS, [group])])], 0
+        if msg_type != self.FAMILY_ID:
+            return [], errno.EINVAL
+
+        if cmd == NL80211_CMD_GET_INTERFACE:
+            return [(NL80211_CMD_NEW_INTERFACE, [
+                nla_pack(NL80211_ATTR_IFINDEX, struct.pack('=I', ifindex)),
+                nla_pack(NL80211_ATTR_IFNAME, name.encode() + b'\0'),
+                nla_pack(NL80211_ATTR_WIPHY, struct.pack('=I', wiphy)),
+            ]) for name, (ifindex, wiphy) in self.interfaces.items()], 0
+        if cmd == NL80211_CMD_GET_WIPHY:
+            wiphy = struct.unpack('=I', attrs[NL80211_ATTR_WIPHY])[0]
+            # Band -> packed frequency attributes
+            bands = {}
+            for freq, disabled in self.wiphy_freqs.get(wiphy, []):
+                freq_attrs = [nla_pack(NL80211_FREQUENCY_ATTR_FREQ, struct.pack('=I', freq))]
+                if disabled:
+                    freq_attrs.append(nla_pack(NL80211_FREQUENCY_ATTR_DISABLED, b''))
+                band = bands.setdefault(wx.get_frequency_band(freq), [])
+                band.append(nla_nested(len(band), freq_attrs))
+            return [(NL80211_CMD_NEW_WIPHY, [
+                nla_pack(NL80211_ATTR_WIPHY, attrs[NL80211_ATTR_WIPHY]),
+                nla_nested(NL80211_ATTR_WIPHY_BANDS, [nla_nested(i, [nla_nested(NL80211_BAND_ATTR_FREQS, freqs)])]),
+            ]) for i, freqs in enumerate(bands.values())], 0
+        if cmd == NL80211_CMD_TRIGGER_SCAN:
+            frequencies = attrs.get(NL80211_ATTR_SCAN_FREQUENCIES)
+            self.triggered.append(None if frequencies is None else
+                                  [struct.unpack('=I', freq)[0] for _, freq in nla_iter(frequencies)])
+            return [], self.scan_error
+        if cmd == NL80211_CMD_GET_SCAN:
+            return [(NL80211_CMD_NEW_SCAN_RESULTS, [
+                nla_pack(NL80211_ATTR_IFINDEX, attrs[NL80211_ATTR_IFINDEX]),
+                nla_nested(NL80211_ATTR_BSS, [
+                    nla_pack(NL80211_BSS_BSSID, bss['bssid']),
+                    nla_pack(NL80211_BSS_FREQUENCY, struct.pack('=I', bss['frequency'])),
+                    nla_pack(NL80211_BSS_INFORMATION_ELEMENTS, bss['ies']),
+                    nla_pack(NL80211_BSS_SIGNAL_MBM, struct.pack('=i', bss['signal_mbm'])),
+                ]),
+            ]) for bss in self.bss_list], 0
+        return [], errno.EOPNOTSUPP
+
+    def recv(self):
+        if not self.pending:
+            # Real socket would wait for its timeout
+            raise socket.timeout("timed out")
+        return self.pending.pop(0)
+
+    def recv_pending(self):
+        datagrams = self.pending
+        self.pending = []
+        return datagrams
+
+    def add_membership(self, group_id):
+        self.groups.add(group_id)
+
+    def close(self):
+        pass
+
+def ie(ie_id, payload):
+    return bytes([ie_id, len(payload)]) + payload
+
+class Nl80211BackendTest(unittest.TestCase):
+    INTERFACES = {'wlan0': (3, 0), 'wlan1': (4, 1)}
+    WIPHY_FREQS = {
+        0: [(2412, False), (2417, False), (2484, True), (5180, False), (5200, True), (6115, False)],
+        1: [(2412, False)],
+    }
+    BSS_LIST = [
+        # 2.4 GHz, HT 20 MHz only
+        {'bssid': bytes.fromhex('001122334455'), 'frequency': 2412, 'signal_mbm': -4500,
+         'ies': ie(0, b'HomeNet') + ie(61, bytes([1, 0]) + bytes(20))},
+        # 5 GHz, any width, VHT 80 MHz
+        {'bssid': bytes.fromhex('66778899aabb'), 'frequency': 5180, 'signal_mbm': -7050,
+         'ies': ie(0, b'Office 5G') + ie(61, bytes([36, 0x04]) + bytes(20)) + ie(192, bytes([1, 42, 0]))},
+        # Hidden, zeroed SSID
+        {'bssid': bytes.fromhex('66778899aacc'), 'frequency': 5200, 'signal_mbm': -8000,
+         'ies': ie(0, bytes(4))},
+    ]
+
+    def create_backend(self, **kwargs):
+        """Returns backend and sockets it opened, one per connection"""
+        sockets = []
+
+        def socket_factory():
+            sockets.append(FakeNetlinkSocket(self.INTERFACES, self.WIPHY_FREQS, self.BSS_LIST, **kwargs))
+            return sockets[-1]
+
+        return wx.Nl80211Backend(socket_factory), sockets
+
+    def test_interfaces(self):
+        backend, _ = self.create_backend()
+        self.assertEqual(backend.get_devices(), ['wlan0', 'wlan1'])
+        self.assertEqual(backend.get_wiphy('wlan1'), '1')
+        self.assertIsNone(backend.get_wiphy('wlan9'))
+
+    def test_split_wiphy_dump(self):
+        backend, _ = self.create_backend()
+        self.assertEqual(backend.get_band_frequencies('wlan0'),
+                         {'2.4 GHz': [2412, 2417], '5 GHz': [5180], '6 GHz': [6115]})
+        self.assertEqual(backend.get_bands('wlan1'), {'2.4 GHz'})
+
+    def test_scan(self):
+        backend, sockets = self.create_backend()
+        networks = backend.scan('wlan0')
+        self.assertEqual(sockets[-1].triggered, [None])
+        self.assertEqual([network.to_dict() for network in networks], [
+            {'bssid': '00:11:22:33:44:55', 'ssid': 'HomeNet', 'channel': 1, 'frequency': 2412,
+             'bandwidth': 20, 'signal': -45, 'device': ''},
+            {'bssid': '66:77:88:99:aa:bb', 'ssid': 'Office 5G', 'channel': 36, 'frequency': 5180,
+             'bandwidth': 80, 'signal': -70, 'device': ''},
+            {'bssid': '66:77:88:99:aa:cc', 'ssid': '(hidden)', 'channel': 0, 'frequency': 5200,
+             'bandwidth': 20, 'signal': -80, 'device': ''},
+        ])
+
+    def test_frequency_restricted_scan(self):
+        backend, sockets = self.create_backend()
+        backend.scan('wlan0', [5180, 6115])
+        self.assertEqual(sockets[-1].triggered, [[5180, 6115]])
+
+    def test_busy(self):
+        backend, _ = self.create_backend(scan_error=errno.EBUSY)
+        with self.assertRaises(OSError) as context:
+            backend.scan('wlan0')
+        self.assertEqual(context.exception.errno, errno.EBUSY)
+
+    def test_unknown_device(self):
+        backend, _ = self.create_backend()
+        with self.assertRaises(wx.ScanError):
+            backend.scan('wlan9')
+
+    def test_stale_scan_event(self):
+        backend, sockets = self.create_backend()
+        backend.scan('wlan0')
+        # Someone else's scan finished while we weren't waiting, ours never does
+        sock = sockets[-1]
+        sock.pending.append(sock.scan_event(struct.pack('=I', 3)))
+        sock.complete_scans = False
+        with self.assertRaises(socket.timeout):
+            backend.scan('wlan0')
+
+if __name__ == '__main__':
+    unittest.main()
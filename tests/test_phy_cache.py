@@ -0,0 +1,67 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from support import load_wireless_explorer
+
+wx = load_wireless_explorer()
+
+BANDS = {'2.4 GHz': [2412, 2437], '5 GHz': [5180]}
+
+class PhyInfoCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'phy-info.json')
+        self.regdomain = mock.patch.object(wx, 'get_regulatory_domain', return_value='DE')
+        self.get_regulatory_domain = self.regdomain.start()
+
+    def tearDown(self):
+        self.regdomain.stop()
+        self.directory.cleanup()
+
+    def test_disk_entry_depends_on_regdomain(self):
+        with mock.patch.object(wx, 'get_device_hardware_key', return_value='iwlwifi/1.0/pci:x'):
+            wx.PhyInfoCache(self.path).put('wlan0', BANDS)
+            self.assertEqual(wx.PhyInfoCache(self.path).get('wlan0'), BANDS)
+            self.get_regulatory_domain.return_value = 'US'
+            self.assertIsNone(wx.PhyInfoCache(self.path).get('wlan0'))
+
+    def test_regdomain_is_looked_up_once_per_discovery(self):
+        cache = wx.PhyInfoCache(self.path)
+        with mock.patch.object(wx, 'get_device_hardware_key', side_effect=lambda name: f'drv/fw/{name}'):
+            cache.get('wlan0')
+            cache.put('wlan1', BANDS)
+            self.assertEqual(self.get_regulatory_domain.call_count, 1)
+            cache.forget()
+            cache.get('wlan0')
+            self.assertEqual(self.get_regulatory_domain.call_count, 2)
+
+    def test_memory_lookup_doesnt_wait_for_hardware(self):
+        cache = wx.PhyInfoCache(self.path)
+        cache.put('wlan1', BANDS)
+        querying = threading.Event()
+        release = threading.Event()
+
+        def get_device_hardware_key(device_name):
+            querying.set()
+            release.wait(5)
+            return None
+
+        with mock.patch.object(wx, 'get_device_hardware_key', get_device_hardware_key):
+            thread = threading.Thread(target=cache.get, args=('wlan0',))
+            thread.start()
+            try:
+                self.assertTrue(querying.wait(5))
+                acquired = cache.lock.acquire(timeout=1)
+                if acquired:
+                    cache.lock.release()
+                self.assertTrue(acquired)
+                self.assertEqual(cache.get_memory('wlan1'), BANDS)
+            finally:
+                release.set()
+                thread.join()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from support import load_wireless_explorer
+
+wx = load_wireless_explorer()
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'survey.log')
+        writer = wx.ScanLogWriter(self.path)
+        for i in range(3):
+            writer.append(1000.0 + i, [wx.Network('00:11:22:33:44:55', 'HomeNet', 1, 2412, 20, -40 - i, 'wlan0')])
+        writer.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_headless_keeps_recorded_time(self):
+        output = io.StringIO()
+        record_path = os.path.join(self.directory.name, 'copy.log')
+        scan_log = wx.ScanLogWriter(record_path)
+        scanner = wx.HeadlessScanner(wx.ReplayBackend(self.path, speed=0), ['replay'], output,
+                                     rate_controller=wx.ScanRateController('fast'), scan_log=scan_log)
+        scanner.run()
+        scan_log.close()
+
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([row['timestamp'] for row in rows], [1000.0, 1001.0, 1002.0])
+        self.assertEqual([row['signal'] for row in rows], [-40, -41, -42])
+        self.assertEqual(list(wx.ScanLogReader(record_path)), [1000.0, 1001.0, 1002.0])
+
+if __name__ == '__main__':
+    unittest.main()
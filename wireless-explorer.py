@@ -4,68 +4,2819 @@
 # https://eax.me/wireless-explorer/
 #
 # Dependencies:
-# sudo apt install python3-gi python3-gi-cairo python3-pygame
+# sudo apt install python3-gi python3-gi-cairo python3-pygame python3-numpy
 
-import pygame
-import numpy
 import os
+import sys
+import csv
 import subprocess
 import threading
 import re
+import collections
+import time
+import json
+import random
+import zlib
+import mmap
+import bisect
+import math
+import argparse
+import concurrent.futures
+import contextlib
+import collections.abc
+import socket
+import struct
+import errno
+import array
+import fcntl
+import asyncio
+import copy
+import stat
+
+# PyGame, NumPy, Cairo and GTK are imported by import_gui_modules()
+# or import_render_modules()
+pygame = numpy = cairo = gi = Gtk = GLib = Gdk = None
+
+# Helpers for parsing `iw dev xxx scan` output
+SCAN_BSSID_RE = re.compile(r'([a-f0-9:]{17})')
+SCAN_NUMBER_RE = re.compile(r'\s*(-?\d+)')
+PHY_FREQUENCY_RE = re.compile(r'\* (\d+(?:\.\d+)?) MHz \[\d+\]')
+
+# Bands in order of tabs, other tab labels are placeholders
+FREQUENCY_BANDS = ['2.4 GHz', '5 GHz', '6 GHz']
+
+def get_frequency_band(frequency):
+    """Determines frequency band by frequency"""
+    if 2400 <= frequency <= 2500:
+        return "2.4 GHz"
+    elif 5000 <= frequency < 5925:
+        return "5 GHz"
+    elif 5925 <= frequency <= 7125:
+        return "6 GHz"
+    return None
+
+class Network:
+    """One BSS found by a scan.
+
+    Numeric fields are parsed once when scan results are read, so sorting,
+    filtering and drawing use them as is. Unknown channel is 0.
+    """
+    __slots__ = ('bssid', 'ssid', 'channel', 'frequency', 'bandwidth', 'signal', 'device', 'seen_by')
+
+    def __init__(self, bssid='?', ssid='(hidden)', channel=0, frequency=0, bandwidth=20, signal=-130,
+                 device='', seen_by=None):
+        self.bssid = bssid
+        self.ssid = ssid
+        self.channel = channel
+        self.frequency = frequency
+        self.bandwidth = bandwidth
+        self.signal = signal
+        self.device = device
+        self.seen_by = seen_by
+
+    @classmethod
+    def from_dict(cls, record):
+        """Creates network from a dict written by to_dict(), older scan logs
+        have numbers stored as strings"""
+        channel = str(record.get('channel', 0))
+        return cls(record.get('bssid', '?'), record.get('ssid', '(hidden)'),
+                   int(channel) if channel.isdigit() else 0,
+                   int(record.get('frequency', 0)), int(record.get('bandwidth', 20)),
+                   int(record.get('signal', -130)), record.get('device', ''), record.get('seen_by'))
+
+    def to_dict(self):
+        record = {name: getattr(self, name) for name in self.__slots__}
+        if self.seen_by is None:
+            del record['seen_by']
+        return record
+
+    def __repr__(self):
+        return f"Network({self.bssid!r}, {self.ssid!r}, {self.frequency} MHz, {self.signal} dBm)"
+
+class PipelineStats:
+    """Rolling timings of scan and refresh pipeline stages.
+
+    Each stage keeps its last `window` durations and net numbers of memory
+    blocks allocated (by sys.getallocatedblocks(), so other threads make it
+    approximate), summarized as p50/p95/max for the overlay and JSON export.
+    """
+    # Stages in pipeline order
+    STAGES = ['scan', 'parse', 'group', 'table', 'draw', 'convert', 'paint']
+
+    def __init__(self, window=256):
+        self.window = window
+        self.lock = threading.Lock()
+        # Stage -> [durations, allocated blocks, total samples]
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times the body of a with statement as a stage"""
+        blocks = sys.getallocatedblocks()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, sys.getallocatedblocks() - blocks)
+
+    def record(self, name, duration, allocations=0):
+        with self.lock:
+            entry = self.samples.get(name)
+            if entry is None:
+                entry = [collections.deque(maxlen=self.window), collections.deque(maxlen=self.window), 0]
+                self.samples[name] = entry
+            entry[0].append(duration)
+            entry[1].append(allocations)
+            entry[2] += 1
+
+    def summary(self):
+        """Returns {stage: {count, p50_ms, p95_ms, max_ms, allocs_p50, allocs_max}}"""
+        with self.lock:
+            samples = {name: (sorted(durations), sorted(allocations), count)
+                       for name, (durations, allocations, count) in self.samples.items()}
+
+        def percentile(values, p):
+            return values[min(int(len(values) * p), len(values) - 1)]
+
+        order = {name: i for i, name in enumerate(self.STAGES)}
+        return {name: {
+            'count': count,
+            'p50_ms': round(percentile(durations, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+            'max_ms': round(durations[-1] * 1000, 3),
+            'allocs_p50': percentile(allocations, 0.5),
+            'allocs_max': allocations[-1],
+        } for name, (durations, allocations, count) in sorted(samples.items(),
+                                                               key=lambda item: order.get(item[0], len(order)))}
+
+    def export(self, path, counters=None):
+        """Writes summary and optional {name: {counter: value}} to a JSON file,
+        replaced atomically so readers never see half of it"""
+        record = {'timestamp': round(time.time(), 3), 'pid': os.getpid(), 'stages': self.summary()}
+        if counters:
+            record['counters'] = counters
+        with open(path + '.tmp', 'w') as f:
+            json.dump(record, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+# Timings of all stages, filled by backends, scan_devices() and GUI
+pipeline_stats = PipelineStats()
+
+class ScanError(Exception):
+    """Raised by scan backends when a device can't be scanned"""
+    pass
+
+class IwBackend:
+    """Scan backend that runs `iw` and parses its text output"""
+    name = "iw"
+
+    def get_devices(self):
+        """Gets list of Wi-Fi devices in the system"""
+        devices = []
+        result = subprocess.run(['iw', 'dev'], capture_output=True, text=True, timeout=5)
+        if result.returncode == 0:
+            lines = result.stdout.split('\n')
+            for line in lines:
+                line = line.strip()
+                if line.startswith('Interface '):
+                    device_name = line.split()[1]
+                    devices.append(device_name)
+        return devices
 
-import gi
-gi.require_version('Gtk', '3.0')
+    def get_wiphy(self, device_name):
+        """Extracts wiphy value from `iw dev xxx info` output"""
+        result = subprocess.run(['iw', 'dev', device_name, 'info'],
+                              capture_output=True, text=True, timeout=10)
+        if result.returncode == 0:
+            for line in result.stdout.split('\n'):
+                if 'wiphy' in line:
+                    return line.split()[-1]
+        return None
+
+    def get_bands(self, device_name):
+        """Gets set of supported bands for specified device"""
+        return set(self.get_band_frequencies(device_name))
+
+    def get_band_frequencies(self, device_name):
+        """Gets {band: [enabled frequencies]} for specified device"""
+        frequencies = {}
+        wiphy = self.get_wiphy(device_name)
+        if wiphy is not None:
+            result = subprocess.run(['iw', 'phy', f'phy{wiphy}', 'info'],
+                                    capture_output=True, text=True, timeout=10)
+            if result.returncode == 0:
+                frequencies = self.parse_phy_info_results(result.stdout)
+        return frequencies
+
+    def scan(self, device_name, frequencies=None):
+        """Runs `iw dev xxx scan`, returns list of networks.
+        If frequencies are given, only they are scanned."""
+        command = ['iw', 'dev', device_name, 'scan']
+        if frequencies:
+            command += ['freq'] + [str(freq) for freq in frequencies]
+        process = subprocess.Popen(command,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        # Kill `iw` if it hangs, same as timeout=30 of subprocess.run()
+        watchdog = threading.Timer(30, process.kill)
+        watchdog.start()
+        try:
+            # Parse scan results for all bands while `iw` is still printing them.
+            # This thread is blocked on the pipe otherwise, so its CPU time is
+            # what parsing takes.
+            cpu_started = time.thread_time()
+            blocks = sys.getallocatedblocks()
+            networks = list(self.iter_scan_results(process.stdout))
+            pipeline_stats.record('parse', time.thread_time() - cpu_started, sys.getallocatedblocks() - blocks)
+            returncode = process.wait()
+        finally:
+            watchdog.cancel()
+
+        if returncode != 0:
+            # iw exits with negated errno, e.g. 240 for EBUSY
+            error = 256 - returncode
+            if error in errno.errorcode:
+                raise OSError(error, f"iw: {os.strerror(error)}")
+            raise ScanError(f"iw exited with code {returncode}")
+        return networks
 
-from gi.repository import Gtk, GLib, GdkPixbuf, Gdk
+    def parse_scan_results(self, scan_output):
+        """Parses `iw scan` results"""
+        return list(self.iter_scan_results(scan_output.split('\n')))
+
+    def iter_scan_results(self, lines):
+        """Parses `iw scan` output line by line, yields a network as soon as its BSS block ends"""
+        network = None
+        missing = 0
+
+        for line in lines:
+            if line.startswith('BSS '):
+                if network is not None:
+                    yield self._finish_scan_result(network)
+                # "BSS 00:11:22:33:44:55(on wlan0) -- associated"
+                bssid_match = SCAN_BSSID_RE.match(line, 4)
+                network = Network(bssid_match.group(1) if bssid_match else '?',
+                                  None, None, None, None, None)
+                missing = 5
+                continue
+
+            # Skip the rest of the block (mostly IE dumps) once everything is found
+            if not missing or network is None:
+                continue
+
+            line = line.strip()
+            if network.frequency is None and line.startswith('freq:'):
+                match = SCAN_NUMBER_RE.match(line, 5)
+                if match:
+                    network.frequency = int(match.group(1))
+                    missing -= 1
+            elif network.ssid is None and line.startswith('SSID:'):
+                network.ssid = line[5:].strip() or '(hidden)'
+                missing -= 1
+            elif network.signal is None and line.startswith('signal:'):
+                match = SCAN_NUMBER_RE.match(line, 7)
+                if match and 'dBm' in line:
+                    network.signal = int(match.group(1))
+                    missing -= 1
+            elif network.channel is None and 'primary channel:' in line:
+                match = SCAN_NUMBER_RE.match(line, line.index('primary channel:') + 16)
+                if match:
+                    network.channel = int(match.group(1))
+                    missing -= 1
+            elif network.bandwidth is None and 'channel width:' in line:
+                # "* STA channel width: any" is skipped, the next one is used
+                match = SCAN_NUMBER_RE.match(line, line.index('channel width:') + 14)
+                if match:
+                    network.bandwidth = int(match.group(1))
+                    missing -= 1
+
+        if network is not None:
+            yield self._finish_scan_result(network)
+
+    def _finish_scan_result(self, network):
+        """Applies defaults to fields that were absent in a BSS block"""
+        if network.ssid is None:
+            network.ssid = '(hidden)'
+        if network.channel is None:
+            network.channel = 0
+        if network.frequency is None:
+            network.frequency = 0
+        if network.signal is None:
+            network.signal = -130
+
+        if network.bandwidth is None:
+            network.bandwidth = 20
+        elif network.bandwidth == 0:
+            # special case: "* channel width: 0 (20 or 40 MHz)"; assume worst
+            network.bandwidth = 40
+        elif network.bandwidth == 1:
+            # special case: "* channel width: 1 (80 MHz)"
+            network.bandwidth = 80
+        elif network.bandwidth in (2, 3):
+            # special case: "* channel width: 2 (160 MHz)" or "3 (80+80 MHz)"
+            network.bandwidth = 160
+
+        return network
+
+    def parse_phy_info_results(self, info_output):
+        """Parses `iw phy phyX info` output, returns {band: [enabled frequencies]}"""
+        frequencies = {}
+        in_band = False
+
+        for line in info_output.split('\n'):
+            line_strip = line.strip()
+            if line_strip.startswith('Band ') and ':' in line_strip:
+                in_band = True
+                continue
+            if not in_band or 'disabled' in line_strip.lower():
+                continue
+
+            # Format is "* 2412.0 MHz [1] (22.0 dBm)"
+            match = PHY_FREQUENCY_RE.match(line_strip)
+            if match:
+                freq = int(float(match.group(1)))
+                band = get_frequency_band(freq)
+                if band:
+                    # Bands with active channels only
+                    frequencies.setdefault(band, []).append(freq)
+        return frequencies
+
+# Netlink / generic netlink / nl80211 constants, see linux/netlink.h,
+# linux/genetlink.h and linux/nl80211.h
+NETLINK_GENERIC = 16
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_ACK = 0x04
+NLM_F_DUMP = 0x300
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3fff
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+NL80211_CMD_GET_WIPHY = 1
+NL80211_CMD_NEW_WIPHY = 3
+NL80211_CMD_GET_INTERFACE = 5
+NL80211_CMD_NEW_INTERFACE = 7
+NL80211_CMD_GET_SCAN = 32
+NL80211_CMD_TRIGGER_SCAN = 33
+NL80211_CMD_NEW_SCAN_RESULTS = 34
+NL80211_CMD_SCAN_ABORTED = 35
+
+NL80211_ATTR_WIPHY = 1
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_IFNAME = 4
+NL80211_ATTR_SCAN_FREQUENCIES = 44
+NL80211_ATTR_WIPHY_BANDS = 22
+NL80211_ATTR_BSS = 47
+NL80211_ATTR_SPLIT_WIPHY_DUMP = 174
+
+NL80211_BAND_ATTR_FREQS = 1
+NL80211_FREQUENCY_ATTR_FREQ = 1
+NL80211_FREQUENCY_ATTR_DISABLED = 2
+
+NL80211_BSS_BSSID = 1
+NL80211_BSS_FREQUENCY = 2
+NL80211_BSS_INFORMATION_ELEMENTS = 6
+NL80211_BSS_SIGNAL_MBM = 7
+NL80211_BSS_BEACON_IES = 11
+
+# Information element IDs
+IE_SSID = 0
+IE_HT_OPERATION = 61
+IE_VHT_OPERATION = 192
+
+def nla_pack(attr_type, payload):
+    """Packs netlink attribute, including alignment padding"""
+    length = 4 + len(payload)
+    return struct.pack('=HH', length, attr_type) + payload + b'\0' * (-length % 4)
+
+def nla_nested(attr_type, attrs):
+    """Packs list of already packed attributes as nested attribute"""
+    return nla_pack(attr_type | NLA_F_NESTED, b''.join(attrs))
+
+def nla_iter(data):
+    """Yields (type, payload) of netlink attributes packed in data"""
+    offset = 0
+    while offset + 4 <= len(data):
+        length, attr_type = struct.unpack_from('=HH', data, offset)
+        if length < 4:
+            break
+        yield attr_type & NLA_TYPE_MASK, data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+
+def nla_parse(data):
+    """Returns netlink attributes packed in data as a dict"""
+    return dict(nla_iter(data))
+
+def nlmsg_pack(msg_type, flags, seq, cmd, attrs):
+    """Packs generic netlink message"""
+    payload = struct.pack('=BBH', cmd, 1, 0) + b''.join(attrs)
+    return struct.pack('=IHHII', 16 + len(payload), msg_type, flags, seq, 0) + payload
+
+def nlmsg_iter(data):
+    """Yields (type, flags, seq, payload) of netlink messages in a datagram"""
+    offset = 0
+    while offset + 16 <= len(data):
+        length, msg_type, flags, seq, _ = struct.unpack_from('=IHHII', data, offset)
+        if length < 16:
+            break
+        yield msg_type, flags, seq, data[offset + 16:offset + length]
+        offset += (length + 3) & ~3
+
+class NetlinkSocket:
+    """Thin wrapper around generic netlink socket"""
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+        self.sock.bind((0, 0))
+        self.sock.settimeout(30)
+
+    def send(self, data):
+        self.sock.send(data)
+
+    def recv(self):
+        return self.sock.recv(65536)
+
+    def recv_pending(self):
+        """Returns datagrams already received, without waiting"""
+        datagrams = []
+        while True:
+            try:
+                datagrams.append(self.sock.recv(65536, socket.MSG_DONTWAIT))
+            except BlockingIOError:
+                return datagrams
+
+    def add_membership(self, group_id):
+        self.sock.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group_id)
+
+    def close(self):
+        self.sock.close()
+
+class Nl80211Connection:
+    """Generic netlink connection to nl80211 family"""
+    def __init__(self, sock):
+        self.sock = sock
+        self.seq = 0
+        self.events = []
+
+        # Resolve nl80211 family id and multicast groups
+        reply = self.request(GENL_ID_CTRL, CTRL_CMD_GETFAMILY,
+                             [nla_pack(CTRL_ATTR_FAMILY_NAME, b'nl80211\0')])[0]
+        self.family_id = struct.unpack('=H', reply[CTRL_ATTR_FAMILY_ID])[0]
+        self.mcast_groups = {}
+        for _, group in nla_iter(reply.get(CTRL_ATTR_MCAST_GROUPS, b'')):
+            group = nla_parse(group)
+            name = group[CTRL_ATTR_MCAST_GRP_NAME].rstrip(b'\0').decode()
+            self.mcast_groups[name] = struct.unpack('=I', group[CTRL_ATTR_MCAST_GRP_ID])[0]
+
+    def request(self, family_id, cmd, attrs, dump=False):
+        """Sends request, returns list of attribute dicts of all replies"""
+        self.seq += 1
+        # Dumps end with NLMSG_DONE, other requests with an ACK
+        flags = NLM_F_REQUEST | (NLM_F_DUMP if dump else NLM_F_ACK)
+        self.sock.send(nlmsg_pack(family_id, flags, self.seq, cmd, attrs))
+
+        replies = []
+        while True:
+            for msg_type, msg_flags, seq, payload in nlmsg_iter(self.sock.recv()):
+                if seq != self.seq:
+                    # Multicast event, handled by wait_event()
+                    self.events.append((msg_type, payload))
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return replies
+                if msg_type == NLMSG_ERROR:
+                    error = -struct.unpack_from('=i', payload)[0]
+                    if error:
+                        raise OSError(error, os.strerror(error))
+                    return replies  # ACK
+                replies.append(nla_parse(payload[4:]))
+
+    def nl80211_request(self, cmd, attrs, dump=False):
+        return self.request(self.family_id, cmd, attrs, dump)
+
+    def join_group(self, name):
+        self.sock.add_membership(self.mcast_groups[name])
+
+    def discard_events(self):
+        """Drops multicast events received so far, e.g. results of scans
+        someone else triggered since we last waited for one"""
+        self.events.clear()
+        self.sock.recv_pending()
+
+    def wait_event(self, commands):
+        """Waits for nl80211 multicast event with one of given commands"""
+        while True:
+            while self.events:
+                msg_type, payload = self.events.pop(0)
+                if msg_type == self.family_id and payload[0] in commands:
+                    return payload[0], nla_parse(payload[4:])
+            for msg_type, _, _, payload in nlmsg_iter(self.sock.recv()):
+                self.events.append((msg_type, payload))
+
+class Nl80211Backend:
+    """Scan backend that talks to the kernel via nl80211 directly"""
+    name = "nl80211"
+
+    def __init__(self, socket_factory=NetlinkSocket):
+        self.socket_factory = socket_factory
+        # Connection for quick queries from GTK main thread
+        self.lock = threading.Lock()
+        self.conn = Nl80211Connection(socket_factory())
+        # Connections for scanning, one per device, used by scan thread only
+        self.scan_conns = {}
+
+    def get_interfaces(self):
+        """Returns {ifname: (ifindex, wiphy)} of all nl80211 interfaces"""
+        with self.lock:
+            replies = self.conn.nl80211_request(NL80211_CMD_GET_INTERFACE, [], dump=True)
+        interfaces = {}
+        for attrs in replies:
+            if NL80211_ATTR_IFNAME in attrs:
+                name = attrs[NL80211_ATTR_IFNAME].rstrip(b'\0').decode()
+                ifindex = struct.unpack('=I', attrs[NL80211_ATTR_IFINDEX])[0]
+                wiphy = struct.unpack('=I', attrs[NL80211_ATTR_WIPHY])[0]
+                interfaces[name] = (ifindex, wiphy)
+        return interfaces
+
+    def get_devices(self):
+        """Gets list of Wi-Fi devices in the system"""
+        return list(self.get_interfaces())
+
+    def get_wiphy(self, device_name):
+        """Gets wiphy index of specified device"""
+        interface = self.get_interfaces().get(device_name)
+        return str(interface[1]) if interface else None
+
+    def get_bands(self, device_name):
+        """Gets set of supported bands for specified device"""
+        return set(self.get_band_frequencies(device_name))
+
+    def get_band_frequencies(self, device_name):
+        """Gets {band: [enabled frequencies]} for specified device"""
+        wiphy = self.get_wiphy(device_name)
+        if wiphy is None:
+            return {}
+
+        attrs = [nla_pack(NL80211_ATTR_WIPHY, struct.pack('=I', int(wiphy))),
+                 nla_pack(NL80211_ATTR_SPLIT_WIPHY_DUMP, b'')]
+        with self.lock:
+            replies = self.conn.nl80211_request(NL80211_CMD_GET_WIPHY, attrs, dump=True)
+
+        # Split dump may spread bands over several messages
+        frequencies = {}
+        for reply in replies:
+            for _, band in nla_iter(reply.get(NL80211_ATTR_WIPHY_BANDS, b'')):
+                band = nla_parse(band)
+                for _, freq in nla_iter(band.get(NL80211_BAND_ATTR_FREQS, b'')):
+                    freq = nla_parse(freq)
+                    if NL80211_FREQUENCY_ATTR_DISABLED in freq:
+                        continue
+                    freq = struct.unpack('=I', freq[NL80211_FREQUENCY_ATTR_FREQ])[0]
+                    freq_band = get_frequency_band(freq)
+                    if freq_band:
+                        frequencies.setdefault(freq_band, []).append(freq)
+        return frequencies
+
+    def scan(self, device_name, frequencies=None):
+        """Triggers scan and returns list of networks.
+        If frequencies are given, only they are scanned."""
+        interface = self.get_interfaces().get(device_name)
+        if interface is None:
+            raise ScanError(f"no such device: {device_name}")
+        ifindex_attr = nla_pack(NL80211_ATTR_IFINDEX, struct.pack('=I', interface[0]))
+
+        conn = self.scan_conns.get(device_name)
+        if conn is None:
+            conn = Nl80211Connection(self.socket_factory())
+            conn.join_group('scan')
+            self.scan_conns[device_name] = conn
+
+        trigger_attrs = [ifindex_attr]
+        if frequencies:
+            trigger_attrs.append(nla_nested(NL80211_ATTR_SCAN_FREQUENCIES, [
+                nla_pack(i, struct.pack('=I', freq)) for i, freq in enumerate(frequencies)]))
+        # Stay subscribed between scans, but forget events of scans by
+        # NetworkManager or wpa_supplicant, or we'd take them for ours
+        conn.discard_events()
+        conn.nl80211_request(NL80211_CMD_TRIGGER_SCAN, trigger_attrs)
+        # Whatever came before the trigger was acknowledged isn't our scan either
+        conn.events.clear()
+        while True:
+            cmd, attrs = conn.wait_event((NL80211_CMD_NEW_SCAN_RESULTS, NL80211_CMD_SCAN_ABORTED))
+            if attrs.get(NL80211_ATTR_IFINDEX) == ifindex_attr[4:]:
+                break
+        if cmd == NL80211_CMD_SCAN_ABORTED:
+            raise ScanError("scan aborted")
+
+        replies = conn.nl80211_request(NL80211_CMD_GET_SCAN, [ifindex_attr], dump=True)
+        with pipeline_stats.stage('parse'):
+            return [self.parse_bss(reply[NL80211_ATTR_BSS]) for reply in replies if NL80211_ATTR_BSS in reply]
+
+    def parse_bss(self, data):
+        """Converts NL80211_ATTR_BSS to the same record `iw` backend produces"""
+        bss = nla_parse(data)
+        ies = bss.get(NL80211_BSS_INFORMATION_ELEMENTS) or bss.get(NL80211_BSS_BEACON_IES, b'')
+
+        network = Network(':'.join(f'{b:02x}' for b in bss.get(NL80211_BSS_BSSID, b'')) or '?')
+        if NL80211_BSS_FREQUENCY in bss:
+            network.frequency = struct.unpack('=I', bss[NL80211_BSS_FREQUENCY])[0]
+        if NL80211_BSS_SIGNAL_MBM in bss:
+            # Truncate mBm to dBm like `iw` does
+            network.signal = int(struct.unpack('=i', bss[NL80211_BSS_SIGNAL_MBM])[0] / 100)
+
+        sta_any_width = False
+        vht_width = None
+        offset = 0
+        while offset + 2 <= len(ies):
+            ie_id, ie_len = ies[offset], ies[offset + 1]
+            ie = ies[offset + 2:offset + 2 + ie_len]
+            offset += 2 + ie_len
+            if ie_id == IE_SSID and network.ssid == '(hidden)':
+                if ie.strip(b'\0'):
+                    network.ssid = ie.decode('utf-8', errors='replace').strip()
+            elif ie_id == IE_HT_OPERATION and len(ie) >= 2:
+                network.channel = ie[0]
+                sta_any_width = bool(ie[1] & 0x04)
+            elif ie_id == IE_VHT_OPERATION and len(ie) >= 1:
+                vht_width = ie[0]
+
+        # Same rules as for "channel width:" lines of `iw` output
+        if not sta_any_width and network.channel:
+            network.bandwidth = 20
+        elif vht_width == 0:
+            network.bandwidth = 40
+        elif vht_width == 1:
+            network.bandwidth = 80
+        elif vht_width in (2, 3):
+            network.bandwidth = 160
+
+        return network
+
+# ioctl request and command to get driver information, see linux/sockios.h and linux/ethtool.h
+SIOCETHTOOL = 0x8946
+ETHTOOL_GDRVINFO = 0x00000003
+
+def get_device_hardware_key(device_name):
+    """Returns "driver/firmware/modalias" string identifying device hardware, or None"""
+    try:
+        # struct ethtool_drvinfo: cmd, driver[32], version[32], fw_version[32], ...
+        drvinfo = array.array('B', struct.pack('=I', ETHTOOL_GDRVINFO) + bytes(192))
+        address, _ = drvinfo.buffer_info()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            fcntl.ioctl(sock, SIOCETHTOOL, struct.pack('16sP', device_name.encode(), address))
+        fields = drvinfo.tobytes()
+        driver = fields[4:36].split(b'\0')[0].decode()
+        firmware = fields[68:100].split(b'\0')[0].decode()
+        with open(f'/sys/class/net/{device_name}/device/modalias') as f:
+            modalias = f.read().strip()
+    except Exception:
+        return None
+    return f'{driver}/{firmware}/{modalias}'
+
+def get_regulatory_domain():
+    """Returns current regulatory domain(s) from `iw reg get`, e.g. "DE" or "DE,US", or None"""
+    try:
+        result = subprocess.run(['iw', 'reg', 'get'], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    # Global domain plus one per self-managed phy, e.g. "country DE: DFS-ETSI"
+    countries = {line.split()[1].rstrip(':') for line in result.stdout.splitlines()
+                 if line.startswith('country ') and len(line.split()) > 1}
+    return ','.join(sorted(countries)) or None
+
+class PhyInfoCache:
+    """Cache of supported bands and their frequencies per device.
+
+    Kept in memory by device name and on disk by driver, firmware,
+    modalias and regulatory domain, since the same hardware with the same
+    firmware always reports the same bands, even after reboot or replug,
+    but which frequencies are enabled depends on the country. Without a
+    known regulatory domain nothing is cached on disk.
+    """
+    def __init__(self, path=None):
+        if path is None:
+            cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+            path = os.path.join(cache_dir, 'wireless-explorer', 'phy-info.json')
+        self.path = path
+        # Guards memory only, get_memory() runs on GTK main thread and must not
+        # wait for hardware queries or file writes
+        self.lock = threading.Lock()
+        self.memory = {}
+        self.disk_lock = threading.Lock()
+        self.disk = None
+        # Regulatory domain is looked up once per discovery pass, until forget()
+        self.regdomain = None
+        self.regdomain_known = False
+
+    def load_disk(self):
+        if self.disk is None:
+            try:
+                with open(self.path) as f:
+                    self.disk = json.load(f)
+            except (OSError, ValueError):
+                self.disk = {}
+        return self.disk
+
+    def get_disk_key(self, device_name):
+        """Returns "driver/firmware/modalias/regdomain" key of on-disk entry, or None"""
+        hardware_key = get_device_hardware_key(device_name)
+        if hardware_key is None:
+            return None
+        if not self.regdomain_known:
+            self.regdomain = get_regulatory_domain()
+            self.regdomain_known = True
+        if self.regdomain is None:
+            return None
+        return f'{hardware_key}/{self.regdomain}'
+
+    def get_memory(self, device_name):
+        """Returns {band: frequencies} cached in memory without touching disk or hardware"""
+        with self.lock:
+            return self.memory.get(device_name)
+
+    def get(self, device_name):
+        """Returns cached {band: frequencies} or None"""
+        frequencies = self.get_memory(device_name)
+        if frequencies is not None:
+            return frequencies
+
+        key = self.get_disk_key(device_name)
+        if key is None:
+            return None
+        with self.disk_lock:
+            frequencies = self.load_disk().get(key)
+        if not isinstance(frequencies, dict):
+            return None
+        with self.lock:
+            self.memory[device_name] = frequencies
+        return frequencies
+
+    def put(self, device_name, frequencies):
+        with self.lock:
+            self.memory[device_name] = frequencies
+        key = self.get_disk_key(device_name)
+        if key is None:
+            return
+        with self.disk_lock:
+            self.load_disk()[key] = frequencies
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path + '.tmp', 'w') as f:
+                    json.dump(self.disk, f, indent=2)
+                os.replace(self.path + '.tmp', self.path)
+            except OSError as e:
+                print(f"PhyInfoCache.put() - {e}")
+
+    def forget(self):
+        """Drops in-memory entries, e.g. when devices are rediscovered"""
+        with self.lock:
+            self.memory = {}
+        self.regdomain_known = False
+
+class ScanLogWriter:
+    """Appends scan results to a log file for later replay.
+
+    The log consists of independent zlib-compressed JSON frames, each
+    preceded by a (timestamp, compressed size) header. Every frame is also
+    recorded in `<path>.idx` as a fixed size (timestamp, offset) entry, so
+    a reader can seek to any moment of a long capture without decompressing
+    what comes before it.
+    """
+    MAGIC = b'WXSCANLOG1\n'
+    FRAME_HEADER = struct.Struct('<dI')
+    INDEX_ENTRY = struct.Struct('<dQ')
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.data_file = open(path, 'ab')
+        if self.data_file.tell() == 0:
+            self.data_file.write(self.MAGIC)
+        self.index_file = open(path + '.idx', 'ab')
+
+    @classmethod
+    def encode_frame(cls, timestamp, networks):
+        """Returns frame header and compressed networks, as written to the log"""
+        records = [network.to_dict() for network in networks]
+        payload = zlib.compress(json.dumps(records, separators=(',', ':')).encode())
+        return cls.FRAME_HEADER.pack(timestamp, len(payload)) + payload
+
+    def append(self, timestamp, networks):
+        frame = self.encode_frame(timestamp, networks)
+        with self.lock:
+            offset = self.data_file.tell()
+            self.data_file.write(frame)
+            self.data_file.flush()
+            # Index entry goes last, so it never points past the data
+            self.index_file.write(self.INDEX_ENTRY.pack(timestamp, offset))
+            self.index_file.flush()
+
+    def close(self):
+        with self.lock:
+            self.data_file.close()
+            self.index_file.close()
+
+class ScanLogReader(collections.abc.Sequence):
+    """Memory-mapped random access to frames of a log written by ScanLogWriter.
+
+    Behaves as a sequence of frame timestamps; read(i) returns
+    (timestamp, networks) of i-th frame.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(ScanLogWriter.MAGIC)] != ScanLogWriter.MAGIC:
+            raise ValueError(f"{path} is not a scan log")
+
+        self.index = b''
+        try:
+            with open(path + '.idx', 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            pass
+        entry_size = ScanLogWriter.INDEX_ENTRY.size
+        self.indexed = len(self.index) // entry_size
+
+        # Frames written after the last index entry (e.g. the recorder was
+        # killed in between) are found by walking frame headers
+        self.extra = []
+        if self.indexed:
+            offset = self.frame_end(self.entry(self.indexed - 1)[1])
+        else:
+            offset = len(ScanLogWriter.MAGIC)
+        header = ScanLogWriter.FRAME_HEADER
+        while offset + header.size <= len(self.data):
+            timestamp, size = header.unpack_from(self.data, offset)
+            if offset + header.size + size > len(self.data):
+                break
+            self.extra.append((timestamp, offset))
+            offset += header.size + size
+
+    def entry(self, i):
+        """Returns (timestamp, offset) of i-th frame"""
+        if i < self.indexed:
+            return ScanLogWriter.INDEX_ENTRY.unpack_from(self.index, i * ScanLogWriter.INDEX_ENTRY.size)
+        return self.extra[i - self.indexed]
+
+    def frame_end(self, offset):
+        header = ScanLogWriter.FRAME_HEADER
+        return offset + header.size + header.unpack_from(self.data, offset)[1]
+
+    def __len__(self):
+        return self.indexed + len(self.extra)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.entry(i)[0]
+
+    def find(self, timestamp):
+        """Returns number of the first frame at or after timestamp"""
+        return bisect.bisect_left(self, timestamp)
+
+    def read(self, i):
+        """Returns (timestamp, networks) of i-th frame"""
+        timestamp, offset = self.entry(i)
+        header = ScanLogWriter.FRAME_HEADER
+        _, size = header.unpack_from(self.data, offset)
+        start = offset + header.size
+        return timestamp, self.decode_payload(self.data[start:start + size])
+
+    @staticmethod
+    def decode_payload(payload):
+        """Returns networks of a frame without its header"""
+        return [Network.from_dict(record) for record in json.loads(zlib.decompress(payload))]
+
+class EndOfScanLog(ScanError):
+    """Raised by ReplayBackend when all recorded scans were replayed"""
+    pass
+
+class ReplayBackend:
+    """Scan backend that plays back a recorded scan log.
+
+    Each scan() returns the next frame. With speed > 0 it waits so that
+    frames come out at recorded pace times speed, with speed 0 they come
+    out as fast as they are requested.
+    """
+    name = "replay"
+    BANDS = {'2.4 GHz', '5 GHz', '6 GHz'}
+
+    def __init__(self, path, speed=1.0, start=0.0):
+        self.reader = ScanLogReader(path)
+        self.speed = speed
+        self.position = self.reader.find(self.reader[0] + start) if len(self.reader) else 0
+        self.clock_start = None
+        # When the frame returned by the last scan() was recorded
+        self.recorded_timestamp = None
+
+    def get_devices(self):
+        return ["replay"]
+
+    def get_wiphy(self, device_name):
+        return None
+
+    def get_bands(self, device_name):
+        return set(self.BANDS)
+
+    def get_band_frequencies(self, device_name):
+        # Recorded scans can't be restricted
+        return {band: [] for band in self.BANDS}
+
+    def scan(self, device_name, frequencies=None):
+        if self.position >= len(self.reader):
+            raise EndOfScanLog("end of scan log")
+
+        timestamp, networks = self.reader.read(self.position)
+        if self.speed > 0:
+            if self.clock_start is None:
+                # Recorded time that corresponds to replay start
+                self.clock_start = (time.monotonic(), timestamp)
+            due = self.clock_start[0] + (timestamp - self.clock_start[1]) / self.speed
+            time.sleep(max(due - time.monotonic(), 0))
+        self.position += 1
+        self.recorded_timestamp = timestamp
+        return networks
+
+def parse_sensor_address(address):
+    """Parses "unix:PATH" or "[HOST]:PORT" of --publish and --collect,
+    returns ('unix', path) or ('tcp', (host, port)), host may be empty"""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"bad address {address!r}, expected unix:PATH or [HOST]:PORT")
+    return 'tcp', (host.strip('[]'), int(port))
+
+class SensorPublisher:
+    """Streams scans of a headless scanner (a sensor) to a collector.
+
+    The stream starts with MAGIC and a length-prefixed JSON hello naming the
+    sensor, followed by frames in ScanLogWriter format. Scans are queued and
+    sent by a thread of its own, all pending ones in one write. The queue
+    keeps at most `max_queue` scans, the oldest are dropped when the
+    collector is slow or unreachable, so scanning is never held back.
+    Lost connection is retried with exponential backoff.
+    """
+    MAGIC = b'WXSENSOR1\n'
+    HELLO_HEADER = struct.Struct('<I')
+    MIN_RETRY = 1.0
+    MAX_RETRY = 30.0
+    # Collector that doesn't read for this long is considered gone
+    SEND_TIMEOUT = 30.0
+
+    def __init__(self, address, name, max_queue=16):
+        self.address = parse_sensor_address(address)
+        self.name = name
+        self.max_queue = max_queue
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.counters = collections.Counter(sent=0, dropped=0, batches=0)
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def publish(self, timestamp, networks):
+        """Queues scan result for sending, never blocks on network"""
+        frame = ScanLogWriter.encode_frame(timestamp, networks)
+        with self.condition:
+            self.queue.append(frame)
+            self.trim_queue()
+            self.condition.notify()
+
+    def trim_queue(self):
+        # Newer scans are worth more than older ones
+        while len(self.queue) > self.max_queue:
+            self.queue.popleft()
+            self.counters['dropped'] += 1
+
+    def connect(self):
+        kind, target = self.address
+        if kind == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.SEND_TIMEOUT)
+            try:
+                sock.connect(target)
+            except OSError:
+                sock.close()
+                raise
+        else:
+            host, port = target
+            sock = socket.create_connection((host or 'localhost', port), self.SEND_TIMEOUT)
+        hello = json.dumps({'sensor': self.name}).encode()
+        sock.sendall(self.MAGIC + self.HELLO_HEADER.pack(len(hello)) + hello)
+        return sock
+
+    def run(self):
+        sock = None
+        retry = 0.0
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    break
+                batch = list(self.queue)
+                self.queue.clear()
+
+            try:
+                if sock is None:
+                    sock = self.connect()
+                sock.sendall(b''.join(batch))
+            except OSError as e:
+                print(f"SensorPublisher.run() - {e}", file=sys.stderr)
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                retry = min(max(retry * 2, self.MIN_RETRY), self.MAX_RETRY)
+                with self.condition:
+                    # Unsent scans go back in front of ones queued meanwhile
+                    self.queue.extendleft(reversed(batch))
+                    self.trim_queue()
+                    # New scans don't cut the wait short, only close() does
+                    if self.condition.wait_for(lambda: self.closed, retry):
+                        break
+                continue
+
+            retry = 0.0
+            self.counters['sent'] += len(batch)
+            self.counters['batches'] += 1
+
+        if sock is not None:
+            sock.close()
+
+    def close(self, timeout=5.0):
+        """Sends what's queued, waiting at most timeout seconds"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join(timeout)
+
+class SensorCollector:
+    """Receives scans from any number of SensorPublisher connections and
+    keeps the latest scan of every sensor.
+
+    Connections are multiplexed by asyncio on a thread of its own. Reading
+    stops while a frame is decoded, so a sensor that sends faster than this
+    is slowed down by TCP flow control, and only one scan per sensor is
+    ever kept in memory.
+    """
+    MAX_HELLO_SIZE = 4096
+    MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, address):
+        self.address = parse_sensor_address(address)
+        self.condition = threading.Condition()
+        # Sensor name -> (monotonic time received, networks of its last scan)
+        self.latest = {}
+        # Number of scans received from all sensors
+        self.generation = 0
+        self.loop = asyncio.new_event_loop()
+        # Server, or exception if it couldn't be started
+        started = concurrent.futures.Future()
+        self.thread = threading.Thread(target=self.run, args=(started,), daemon=True)
+        self.thread.start()
+        self.server = started.result()
+
+    def run(self, started):
+        asyncio.set_event_loop(self.loop)
+        try:
+            server = self.loop.run_until_complete(self.start_server())
+        except Exception as e:
+            started.set_exception(e)
+            return
+        started.set_result(server)
+        self.loop.run_forever()
+
+    async def start_server(self):
+        kind, target = self.address
+        if kind == 'unix':
+            # Socket left over by a collector that wasn't shut down cleanly
+            with contextlib.suppress(FileNotFoundError):
+                if stat.S_ISSOCK(os.stat(target).st_mode):
+                    os.unlink(target)
+            return await asyncio.start_unix_server(self.handle_sensor, target)
+        host, port = target
+        return await asyncio.start_server(self.handle_sensor, host or None, port)
+
+    async def handle_sensor(self, reader, writer):
+        """Reads scans of one sensor until it disconnects"""
+        name = None
+        try:
+            if await reader.readexactly(len(SensorPublisher.MAGIC)) != SensorPublisher.MAGIC:
+                raise ValueError("not a sensor")
+            header = SensorPublisher.HELLO_HEADER
+            size, = header.unpack(await reader.readexactly(header.size))
+            if size > self.MAX_HELLO_SIZE:
+                raise ValueError(f"hello of {size} bytes")
+            name = str(json.loads(await reader.readexactly(size))['sensor'])
+
+            header = ScanLogWriter.FRAME_HEADER
+            while True:
+                try:
+                    data = await reader.readexactly(header.size)
+                except asyncio.IncompleteReadError as e:
+                    if e.partial:
+                        raise
+                    break  # Sensor disconnected between scans
+                _, size = header.unpack(data)
+                if size > self.MAX_FRAME_SIZE:
+                    raise ValueError(f"frame of {size} bytes")
+                networks = ScanLogReader.decode_payload(await reader.readexactly(size))
+                # Device column shows sensor and its radio
+                for network in networks:
+                    network.device = f"{name}/{network.device}" if network.device else name
+                with self.condition:
+                    self.latest[name] = (time.monotonic(), networks)
+                    self.generation += 1
+                    self.condition.notify_all()
+        except (OSError, ValueError, KeyError, zlib.error, asyncio.IncompleteReadError) as e:
+            print(f"SensorCollector.handle_sensor() - {name or 'unknown sensor'}: {e}", file=sys.stderr)
+        finally:
+            writer.close()
+
+    def wait(self, generation, timeout):
+        """Waits until more than `generation` scans were received,
+        returns number of scans received"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation > generation, timeout)
+            return self.generation
+
+    def snapshot(self, max_age):
+        """Returns (number of scans received, [(sensor, networks), ...]) of
+        sensors heard from within max_age seconds"""
+        with self.condition:
+            now = time.monotonic()
+            return self.generation, [(sensor, networks) for sensor, (received, networks) in self.latest.items()
+                                     if now - received <= max_age]
+
+class CollectorBackend:
+    """Scan backend that shows scans streamed by sensors.
+
+    All sensors appear as one device. Each scan() waits for new results
+    from any sensor and returns latest scans of all of them merged by
+    BSSID, with 'seen_by' listing sensors that saw a network.
+    """
+    name = "collector"
+    DEVICE = "sensors"
+    BANDS = ReplayBackend.BANDS
+    # Scans of other sensors arriving this soon after the first new one
+    # are shown together
+    BATCH_WINDOW = 0.5
+    # Scans of sensors silent for longer are left out
+    STALE_AFTER = 60.0
+    WAIT_TIMEOUT = 30.0
+
+    def __init__(self, address):
+        self.collector = SensorCollector(address)
+        self.generation = 0
+
+    def get_devices(self):
+        return [self.DEVICE]
+
+    def get_wiphy(self, device_name):
+        return None
+
+    def get_bands(self, device_name):
+        return set(self.BANDS)
+
+    def get_band_frequencies(self, device_name):
+        # Sensors decide what they scan
+        return {band: [] for band in self.BANDS}
+
+    def scan(self, device_name, frequencies=None):
+        if self.collector.wait(self.generation, self.WAIT_TIMEOUT) == self.generation:
+            raise ScanError(f"no scans from sensors in {self.WAIT_TIMEOUT:.0f} s")
+        time.sleep(self.BATCH_WINDOW)
+        self.generation, latest = self.collector.snapshot(self.STALE_AFTER)
+        # Merging marks networks, the kept ones are merged again next time
+        return merge_scan_results([(sensor, [copy.copy(network) for network in networks])
+                                   for sensor, networks in latest])
+
+def get_scan_timestamp(backend):
+    """Returns time of the last scan of a backend: when it was recorded
+    for replayed scans, now for live ones"""
+    return getattr(backend, 'recorded_timestamp', None) or time.time()
+
+def create_scan_backend(name="auto"):
+    """Creates scan backend, falls back to `iw` if nl80211 isn't usable"""
+    if name in ("auto", "nl80211"):
+        try:
+            return Nl80211Backend()
+        except Exception as e:
+            if name == "nl80211":
+                raise
+            print(f"create_scan_backend() - nl80211 unavailable, using iw: {e}", file=sys.stderr)
+    return IwBackend()
+
+class TextCache:
+    """LRU cache of text rendered by a PyGame font.
+
+    Keyed by (text, color, background), so SSIDs and frequencies that don't
+    change between redraws are rasterized only once.
+    """
+    def __init__(self, font, max_entries=1024):
+        self.font = font
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def set_font(self, font):
+        """Replaces font and drops everything rendered with the old one"""
+        self.font = font
+        self.invalidate()
+
+    def invalidate(self):
+        self.entries.clear()
+
+    def render(self, text, color, background=None):
+        """Returns antialiased text Surface, same as font.render(text, True, color, background)"""
+        key = (text, color, background)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font.render(text, True, color, background)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+# Set of contrasting colors for networks
+NETWORK_COLORS = [
+    (255, 0, 0),    # Red
+    (0, 255, 0),    # Green
+    (255, 165, 0),  # Orange
+    (255, 0, 255),  # Purple
+    (0, 255, 255),  # Cyan
+    (255, 255, 0),  # Yellow
+    (255, 20, 147), # Pink
+    (0, 191, 255),  # Blue
+    (50, 205, 50),  # Lime
+    (220, 20, 60),  # Crimson
+    (128, 0, 128),  # Violet
+    (255, 140, 0),  # Dark Orange
+    (32, 178, 170), # Light Sea Green
+    (255, 69, 0),   # Red-Orange
+    (138, 43, 226), # Blue-Violet
+    (0, 128, 0),    # Dark Green
+    (255, 105, 180),# Hot Pink
+    (30, 144, 255), # Dodger Blue
+    (255, 215, 0),  # Gold
+    (128, 128, 0),  # Olive
+    (255, 0, 127),  # Rose
+    (0, 255, 127),  # Spring Green
+    (255, 127, 80), # Coral
+    (148, 0, 211),  # Dark Violet
+    (0, 206, 209),  # Dark Turquoise
+    (255, 192, 203),# Light Pink
+    (154, 205, 50), # Yellow Green
+    (255, 99, 71),  # Tomato
+    (72, 61, 139),  # Dark Slate Blue
+    (255, 228, 181) # Moccasin
+]
+
+def envelope_outline(spans, width, base_y):
+    """Returns step polyline around (left, right, top y) spans listed from
+    the strongest, every pixel column is filled once no matter how many
+    spans cover it"""
+    tops = [base_y] * width
+    # Union-find style pointers to the next column that isn't filled yet
+    next_free = list(range(width + 1))
+
+    def find(x):
+        while next_free[x] != x:
+            next_free[x] = next_free[next_free[x]]
+            x = next_free[x]
+        return x
+
+    # Strongest first, so a column gets the top of the highest span
+    for left_pos, right_pos, top_y in spans:
+        x = find(max(left_pos, 0))
+        while x < min(right_pos, width):
+            tops[x] = top_y
+            next_free[x] = x + 1
+            x = find(x + 1)
+
+    # Step outline: a vertical segment wherever top changes
+    points = [(0, tops[0])]
+    for x in range(1, width):
+        if tops[x] != tops[x - 1]:
+            points += [(x, tops[x - 1]), (x, tops[x])]
+    points.append((width - 1, tops[-1]))
+    return points
+
+def place_labels(labels, width, min_y, line_height, bucket_width, stack_depth):
+    """Places (index, center x, y, text width, text height) labels greedily,
+    strongest first. A label that collides with already placed ones is moved
+    up by line_height up to stack_depth times or skipped.
+    Returns (index, left, top) of placed labels."""
+    placed = []
+    # Bucket index -> (left, top, right, bottom) of placed labels that touch it
+    grid = collections.defaultdict(list)
+    for index, center_x, y, text_width, text_height in labels:
+        left = max(min(center_x - text_width // 2, width - text_width), 0)
+        right = left + text_width
+        buckets = range(left // bucket_width, (right - 1) // bucket_width + 1)
+
+        top = None
+        for _ in range(stack_depth + 1):
+            if y < min_y:
+                break
+            bottom = y + text_height
+            if not any(left < other_right and other_left < right and y < other_bottom and other_top < bottom
+                       for bucket in buckets
+                       for other_left, other_top, other_right, other_bottom in grid[bucket]):
+                top = y
+                break
+            y -= line_height
+        if top is None:
+            continue
+
+        for bucket in buckets:
+            grid[bucket].append((left, top, right, top + text_height))
+        placed.append((index, left, top))
+    return placed
+
+class SpectrumRenderer:
+    """Draws networks of a band as trapezoids over a frequency ruler.
+
+    The picture is composed of cached layers: ruler, network outlines
+    (drawn over a copy of the ruler), selection highlight and SSID labels.
+    A layer is re-rendered only when the geometry it depends on changes,
+    e.g. selecting another network redraws just the highlight.
+
+    In dense places drawing cost is bounded by surface size: only as many of
+    the strongest networks as fit MIN_OUTLINE_WIDTH pixels each get their own
+    outline, weaker ones are merged into one envelope, and labels that
+    would overlap are stacked or skipped.
+    """
+    # Ruler pixels per individually outlined network
+    MIN_OUTLINE_WIDTH = 4
+    # Width of x buckets labels are indexed by, and how many lines
+    # a colliding label may be moved up
+    LABEL_BUCKET_WIDTH = 64
+    LABEL_STACK_DEPTH = 3
 
-class WirelessExplorer:
     def __init__(self):
         # Surface parameters
-        self.pygame_width = 1600
-        self.pygame_height = 300
+        self.width = 1600
+        self.height = 300
+        self.ui_scale = 1
         self.background_color = (0, 0, 0)
         self.foreground_color = (255, 255, 255)
 
-        # Set of contrasting colors for networks
-        self.network_colors = [
-            (255, 0, 0),    # Red
-            (0, 255, 0),    # Green
-            (255, 165, 0),  # Orange
-            (255, 0, 255),  # Purple
-            (0, 255, 255),  # Cyan
-            (255, 255, 0),  # Yellow
-            (255, 20, 147), # Pink
-            (0, 191, 255),  # Blue
-            (50, 205, 50),  # Lime
-            (220, 20, 60),  # Crimson
-            (128, 0, 128),  # Violet
-            (255, 140, 0),  # Dark Orange
-            (32, 178, 170), # Light Sea Green
-            (255, 69, 0),   # Red-Orange
-            (138, 43, 226), # Blue-Violet
-            (0, 128, 0),    # Dark Green
-            (255, 105, 180),# Hot Pink
-            (30, 144, 255), # Dodger Blue
-            (255, 215, 0),  # Gold
-            (128, 128, 0),  # Olive
-            (255, 0, 127),  # Rose
-            (0, 255, 127),  # Spring Green
-            (255, 127, 80), # Coral
-            (148, 0, 211),  # Dark Violet
-            (0, 206, 209),  # Dark Turquoise
-            (255, 192, 203),# Light Pink
-            (154, 205, 50), # Yellow Green
-            (255, 99, 71),  # Tomato
-            (72, 61, 139),  # Dark Slate Blue
-            (255, 228, 181) # Moccasin
-        ]
+        self.network_colors = NETWORK_COLORS
 
         pygame.init()
         self.font = pygame.font.Font(None, 24)
+        self.text_cache = TextCache(self.font)
+
+        # Layer name -> (inputs it was rendered from, Surface)
+        self.layers = {}
+
+        # Networks list last drawn and its NumPy columns
+        self.columns_source = None
+        self.columns = None
+
+        # Two (Cairo surface, PyGame surface) buffers, one can be shown while
+        # the other one is drawn. cairo_surface and surface are the selected one.
+        self.buffers = []
+        self.cairo_surface = None
+        self.surface = None
+        self.resize(self.width, self.height)
+
+    def resize(self, width, height, scale=1):
+        """Creates buffers of new size, selects the first one"""
+        self.width = width
+        self.height = height
+        if scale != self.ui_scale:
+            self.ui_scale = scale
+            self.font = pygame.font.Font(None, 24 * scale)
+            self.text_cache.set_font(self.font)
+        self.layers = {}
+        self.buffers = [self.create_buffer(width, height, scale) for _ in range(2)]
+        self.select_buffer(0)
+
+    def create_buffer(self, width, height, scale):
+        """Creates PyGame surface that draws directly into Cairo image surface memory"""
+        # Cairo RGB24 is BGRX in memory on little endian machines, which PyGame
+        # can wrap as BGRA. Both surfaces share one pixel buffer, so nothing
+        # has to be copied or converted to display a frame.
+        cairo_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+        surface = pygame.image.frombuffer(
+            cairo_surface.get_data(),
+            (width, height),
+            'BGRA',
+            cairo_surface.get_stride()
+        )
+        # Let Cairo paint device pixels 1:1 on HiDPI screens
+        cairo_surface.set_device_scale(scale, scale)
+        return cairo_surface, surface
+
+    def select_buffer(self, index):
+        """Makes following draws go to a buffer"""
+        self.cairo_surface, self.surface = self.buffers[index]
+
+    def invalidate(self):
+        """Drops cached layers and columns, so the next draw renders everything"""
+        self.layers = {}
+        self.columns_source = None
+        self.columns = None
+
+    def get_columns(self, networks):
+        """Returns networks as NumPy column arrays, converted once per list"""
+        if networks is self.columns_source:
+            return self.columns
+
+        ssids = tuple(network.ssid for network in networks)
+        count = len(networks)
+        self.columns = {
+            'frequency': numpy.fromiter((network.frequency for network in networks), numpy.float64, count),
+            'bandwidth': numpy.fromiter((network.bandwidth for network in networks), numpy.float64, count),
+            'signal': numpy.fromiter((network.signal for network in networks), numpy.float64, count),
+            'ssid': ssids,
+            'has_ssid': numpy.array([ssid != '(hidden)' for ssid in ssids], dtype=bool),
+            'bssid_index': {network.bssid: i for i, network in enumerate(networks)},
+        }
+        self.columns_source = networks
+        return self.columns
+
+    def compute_geometry(self, networks, threshold, congestion=None):
+        """Calculates screen coordinates of ruler, trapezoids and labels in one vectorized pass"""
+        columns = self.get_columns(networks)
+
+        # Surface is in device pixels, scale layout for HiDPI screens
+        ui_scale = self.ui_scale
+
+        # Calculate frequency ranges
+        freq = columns['frequency']
+        left_freq = freq - columns['bandwidth'] / 2
+        right_freq = freq + columns['bandwidth'] / 2
+
+        # Find overall range
+        min_freq = left_freq.min()
+        max_freq = right_freq.max()
+
+        # Ruler parameters
+        ruler_y = self.height - 40 * ui_scale
+        ruler_left = 25 * ui_scale
+        ruler_right = self.width - 25 * ui_scale
+        ruler_width = ruler_right - ruler_left
+        px_per_mhz = ruler_width / (max_freq - min_freq)
+
+        # Ticks for each distinct frequency, in order of first appearance
+        _, first_index = numpy.unique(freq, return_index=True)
+        tick_freq = freq[numpy.sort(first_index)]
+        tick_x = ruler_left + ((tick_freq - min_freq) * px_per_mhz).astype(int)
 
-        # Create surface for rendering (initially fixed size)
-        self.pygame_surface = pygame.Surface((self.pygame_width, self.pygame_height))
-        self.current_pixbuf = None
+        # Calculate maximum trapezoid height
+        font_height = self.font.get_height()
+        ruler_space = 50 * ui_scale  # Space for ruler and labels
+        max_tr_height = self.height - font_height - ruler_space
+
+        # Calculate height proportional to signal, minimum 1 pixel
+        signal = columns['signal']
+        signal_range = signal.max() - threshold
+        if signal_range > 0:
+            tr_height = ((signal - threshold) / signal_range * max_tr_height).astype(int)
+        else:
+            tr_height = numpy.ones(len(signal), dtype=int)
+        tr_height = numpy.maximum(tr_height, 1)
+
+        # Calculate left and right boundaries and trapezoid coordinates
+        left_pos = ruler_left + ((left_freq - min_freq) * px_per_mhz).astype(int)
+        right_pos = ruler_left + ((right_freq - min_freq) * px_per_mhz).astype(int)
+        tr_width = numpy.maximum(right_pos - left_pos, 1)  # Minimum 1 pixel
+        top_inset = (tr_width * 0.1).astype(int)
+
+        # Rows: left, top left, top right, right, top y. Columns are in drawing
+        # order, first with weak signals, then with strong ones.
+        trapezoids = numpy.stack((
+            left_pos,
+            left_pos + top_inset,
+            right_pos - top_inset,
+            right_pos,
+            ruler_y - tr_height,
+        ))[:, ::-1]
+
+        # SSIDs above trapezoids, at least 5 pixels from top
+        label_x = (left_pos + right_pos) // 2
+        label_y = numpy.maximum(ruler_y - tr_height - font_height - 5 * ui_scale, 5 * ui_scale)
+
+        # Number of strongest networks drawn in detail
+        detail = min(len(signal), max(ruler_width // (self.MIN_OUTLINE_WIDTH * ui_scale), 1))
+
+        return {
+            'columns': columns,
+            'ruler_y': ruler_y,
+            'ruler': (ruler_left, ruler_right, ruler_y, tick_x, tick_freq),
+            'freq_range': (float(min_freq), float(max_freq)),
+            'congestion': congestion,
+            'trapezoids': trapezoids,
+            'labels': numpy.stack((label_x, label_y))[:, ::-1],
+            'detail': detail,
+        }
+
+    def get_layer(self, name, key, render, *args):
+        """Returns cached layer, calls render(*args) if key changed"""
+        cached = self.layers.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        layer = render(*args)
+        self.layers[name] = (key, layer)
+        return layer
+
+    def network_color(self, index):
+        # Choose color cyclically by position in list sorted by signal
+        return self.network_colors[index % len(self.network_colors)]
+
+    def render_ruler(self, ruler, freq_range, congestion):
+        ruler_left, ruler_right, ruler_y, tick_x, tick_freq = ruler
+        ui_scale = self.ui_scale
+        layer = pygame.Surface((self.width, self.height))
+        layer.fill(self.background_color)
+        if congestion is not None:
+            self.render_congestion(layer, ruler, freq_range, congestion)
+
+        # Draw main ruler line
+        pygame.draw.line(layer, self.foreground_color,
+                        (ruler_left, ruler_y), (ruler_right, ruler_y), 2 * ui_scale)
+
+        for pos_x, freq in zip(tick_x.tolist(), tick_freq.tolist()):
+            # Draw tick
+            pygame.draw.line(layer, self.foreground_color,
+                           (pos_x, ruler_y - 10 * ui_scale), (pos_x, ruler_y + 10 * ui_scale), 2 * ui_scale)
+
+            # Draw frequency label
+            freq_text = self.text_cache.render(str(int(freq)), self.foreground_color)
+            text_rect = freq_text.get_rect(center=(pos_x, ruler_y + 25 * ui_scale))
+            layer.blit(freq_text, text_rect)
+
+        return layer
+
+    def render_congestion(self, layer, ruler, freq_range, congestion):
+        """Shades background above the ruler by power a 20 MHz channel
+        centered there would share with networks, from green to red"""
+        ruler_left, ruler_right, ruler_y = ruler[:3]
+        min_freq, max_freq = freq_range
+        mhz_per_px = (max_freq - min_freq) / (ruler_right - ruler_left)
+        power = numpy.array([congestion.power(min_freq + x * mhz_per_px)
+                             for x in range(ruler_right - ruler_left)], dtype=numpy.float64)
+
+        # -95 dBm and below is clean, -40 dBm and above is congested
+        level = numpy.clip((power + 95) / 55, 0, 1)
+        shades = numpy.zeros((len(power), 1, 3), dtype=numpy.uint8)
+        shades[:, 0, 0] = numpy.nan_to_num(level * 90)
+        shades[:, 0, 1] = numpy.nan_to_num((1 - level) * 40)
+        shading = pygame.transform.scale(pygame.surfarray.make_surface(shades),
+                                         (ruler_right - ruler_left, ruler_y))
+        layer.blit(shading, (ruler_left, 0))
+
+    def render_outlines(self, geometry):
+        ruler = geometry['ruler']
+        ruler_y = geometry['ruler_y']
+        freq_range = geometry['freq_range']
+        congestion = geometry['congestion']
+        ruler_key = ruler[:3] + (ruler[3].tobytes(), ruler[4].tobytes(), freq_range, congestion)
+        # Outlines are drawn over the ruler, so both are composed with one blit
+        layer = self.get_layer('ruler', ruler_key, self.render_ruler, ruler, freq_range, congestion).copy()
+
+        trapezoids = geometry['trapezoids']
+        count = trapezoids.shape[1]
+        collapsed = count - geometry['detail']
+        if collapsed:
+            self.render_envelope(layer, trapezoids[:, :collapsed], ruler_y)
+
+        line_width = 2 * self.ui_scale
+        for i, (left_pos, top_left, top_right, right_pos, top_y) in enumerate(trapezoids[:, collapsed:].T.tolist(),
+                                                                              collapsed):
+            # First network in list gets the first color, despite being drawn last
+            color = self.network_color(count - i - 1)
+
+            # Draw trapezoid outline - 3 sides without bottom
+            # Left side
+            pygame.draw.aaline(layer, color, (left_pos, ruler_y), (top_left, top_y))
+            # Right side
+            pygame.draw.aaline(layer, color, (right_pos, ruler_y), (top_right, top_y))
+            # Top side, narrowed
+            pygame.draw.line(layer, color, (top_left, top_y), (top_right, top_y), line_width)
+
+        return layer
+
+    def render_envelope(self, layer, trapezoids, ruler_y):
+        """Draws one outline around trapezoids of many weak networks"""
+        spans = [(left_pos, right_pos, top_y)
+                 for left_pos, _, _, right_pos, top_y in reversed(trapezoids.T.tolist())]
+        pygame.draw.lines(layer, (128, 128, 128), False, envelope_outline(spans, self.width, ruler_y))
+
+    def render_highlight(self, ruler_y, color, trapezoid):
+        """Draws semi-transparent fill of selected network into bounding box sized surface"""
+        left_pos, top_left, top_right, right_pos, top_y = trapezoid
+
+        layer = pygame.Surface((right_pos - left_pos + 1, ruler_y - top_y + 1), pygame.SRCALPHA)
+        fill_color = (*color, 80)  # Color with alpha channel (semi-transparency)
+        trapezoid_points = [
+            (0, ruler_y - top_y),
+            (top_left - left_pos, 0),
+            (top_right - left_pos, 0),
+            (right_pos - left_pos, ruler_y - top_y)
+        ]
+        pygame.draw.polygon(layer, fill_color, trapezoid_points)
+        return layer
+
+    def render_labels(self, geometry):
+        """Places SSIDs greedily from the strongest network. A label that
+        collides with already placed ones is moved up or skipped."""
+        layer = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+        columns = geometry['columns']
+        ssids = columns['ssid']
+        has_ssid = columns['has_ssid'].tolist()
+        # Back to list order, strongest first
+        labels = geometry['labels'][:, ::-1].T.tolist()
+        font = self.font
+        candidates = ((index, center_x, y) + font.size(ssids[index])
+                      for index, (center_x, y) in enumerate(labels[:geometry['detail']]) if has_ssid[index])
+        for index, left, top in place_labels(candidates, self.width, 5 * self.ui_scale, font.get_linesize(),
+                                             self.LABEL_BUCKET_WIDTH * self.ui_scale, self.LABEL_STACK_DEPTH):
+            layer.blit(self.text_cache.render(ssids[index], self.network_color(index), self.background_color),
+                       (left, top))
+        return layer
+
+    def draw(self, networks, selected_bssid, threshold, congestion=None):
+        """Draws networks into the shared surface, with background shaded by
+        ChannelCongestion if given"""
+        if not networks:
+            self.surface.fill(self.background_color)
+            empty_text = self.text_cache.render("List is empty", self.foreground_color)
+            text_rect = empty_text.get_rect(center=(self.width // 2, self.height // 2))
+            self.surface.blit(empty_text, text_rect)
+            return
+
+        geometry = self.compute_geometry(networks, threshold, congestion)
+        ruler_y = geometry['ruler_y']
+        trapezoids = geometry['trapezoids']
+
+        ruler = geometry['ruler']
+        outlines_key = (ruler_y, ruler[3].tobytes(), ruler[4].tobytes(), trapezoids.tobytes(),
+                        geometry['freq_range'], congestion, geometry['detail'])
+        outlines = self.get_layer('outlines', outlines_key, self.render_outlines, geometry)
+        self.surface.blit(outlines, (0, 0))
+
+        index = geometry['columns']['bssid_index'].get(selected_bssid) if selected_bssid else None
+        if index is not None:
+            trapezoid = tuple(trapezoids[:, len(networks) - index - 1].tolist())
+            color = self.network_color(index)
+            highlight = self.get_layer('highlight', (ruler_y, color, trapezoid),
+                                       self.render_highlight, ruler_y, color, trapezoid)
+            self.surface.blit(highlight, (trapezoid[0], trapezoid[4]))
+
+        labels_key = (geometry['columns']['ssid'], geometry['labels'].tobytes(), geometry['detail'])
+        self.surface.blit(self.get_layer('labels', labels_key, self.render_labels, geometry), (0, 0))
+
+class CairoSpectrumRenderer:
+    """Draws the same picture as SpectrumRenderer with Cairo vector
+    operations, straight into the context GTK paints the widget with.
+
+    Needs neither PyGame nor NumPy and stays sharp at any HiDPI scale,
+    since coordinates are in logical pixels. There are no cached layers:
+    everything but the congestion gradient is drawn on every paint.
+    """
+    MIN_OUTLINE_WIDTH = SpectrumRenderer.MIN_OUTLINE_WIDTH
+    LABEL_BUCKET_WIDTH = SpectrumRenderer.LABEL_BUCKET_WIDTH
+    LABEL_STACK_DEPTH = SpectrumRenderer.LABEL_STACK_DEPTH
+    FONT_SIZE = 16
+
+    def __init__(self):
+        self.background_color = (0, 0, 0)
+        self.foreground_color = (1, 1, 1)
+        self.network_colors = [(r / 255, g / 255, b / 255) for r, g, b in NETWORK_COLORS]
+        # Inputs congestion gradient was built from and the gradient
+        self.shading = (None, None)
+
+    def invalidate(self):
+        """Drops cached congestion gradient"""
+        self.shading = (None, None)
+
+    def network_color(self, index):
+        # Choose color cyclically by position in list sorted by signal
+        return self.network_colors[index % len(self.network_colors)]
+
+    def compute_geometry(self, cr, networks, threshold, width, height):
+        """Calculates coordinates of ruler, trapezoids and labels, in list order"""
+        left_freq = [network.frequency - network.bandwidth / 2 for network in networks]
+        right_freq = [network.frequency + network.bandwidth / 2 for network in networks]
+        min_freq = min(left_freq)
+        max_freq = max(right_freq)
+
+        # Ruler parameters
+        ruler_y = height - 40
+        ruler_left = 25
+        ruler_right = width - 25
+        ruler_width = ruler_right - ruler_left
+        px_per_mhz = ruler_width / (max_freq - min_freq)
+
+        # Ticks for each distinct frequency, in order of first appearance
+        tick_freq = list(dict.fromkeys(network.frequency for network in networks))
+        tick_x = [ruler_left + int((freq - min_freq) * px_per_mhz) for freq in tick_freq]
+
+        # Calculate maximum trapezoid height, leaving space for ruler and labels
+        font_height = cr.font_extents()[2]
+        max_tr_height = height - font_height - 50
+
+        signal_range = max(network.signal for network in networks) - threshold
+        trapezoids = []
+        labels = []
+        for network, left, right in zip(networks, left_freq, right_freq):
+            # Height proportional to signal, minimum 1 pixel
+            if signal_range > 0:
+                tr_height = max(int((network.signal - threshold) / signal_range * max_tr_height), 1)
+            else:
+                tr_height = 1
+            left_pos = ruler_left + int((left - min_freq) * px_per_mhz)
+            right_pos = ruler_left + int((right - min_freq) * px_per_mhz)
+            top_inset = int(max(right_pos - left_pos, 1) * 0.1)
+            top_y = ruler_y - tr_height
+            trapezoids.append((left_pos, left_pos + top_inset, right_pos - top_inset, right_pos, top_y))
+            # SSID above trapezoid, at least 5 pixels from top
+            labels.append(((left_pos + right_pos) // 2, max(top_y - font_height - 5, 5)))
+
+        return {
+            'ruler': (ruler_left, ruler_right, ruler_y, tick_x, tick_freq),
+            'freq_range': (min_freq, max_freq),
+            'trapezoids': trapezoids,
+            'labels': labels,
+            # Number of strongest networks drawn in detail
+            'detail': min(len(networks), max(ruler_width // self.MIN_OUTLINE_WIDTH, 1)),
+        }
+
+    def draw_text(self, cr, text, x, y, color, background=None):
+        """Draws text with top left corner at (x, y)"""
+        ascent, descent = cr.font_extents()[:2]
+        if background is not None:
+            cr.set_source_rgb(*background)
+            cr.rectangle(x, y, cr.text_extents(text)[4], ascent + descent)
+            cr.fill()
+        cr.set_source_rgb(*color)
+        cr.move_to(x, y + ascent)
+        cr.show_text(text)
+
+    def draw_centered_text(self, cr, text, x, y, color):
+        extents = cr.text_extents(text)
+        cr.set_source_rgb(*color)
+        cr.move_to(x - extents[2] / 2 - extents[0], y - extents[3] / 2 - extents[1])
+        cr.show_text(text)
+
+    def draw_congestion(self, cr, ruler, freq_range, congestion):
+        """Shades background above the ruler by power a 20 MHz channel
+        centered there would share with networks, from green to red"""
+        ruler_left, ruler_right, ruler_y = ruler[:3]
+        key = (ruler_left, ruler_right, freq_range, congestion)
+        cached_key, gradient = self.shading
+        if cached_key != key:
+            min_freq, max_freq = freq_range
+            # Color stops every few pixels are enough, Cairo interpolates between them
+            steps = max((ruler_right - ruler_left) // 4, 1)
+            gradient = cairo.LinearGradient(ruler_left, 0, ruler_right, 0)
+            for step in range(steps + 1):
+                power = congestion.power(min_freq + (max_freq - min_freq) * step / steps)
+                if power is None:
+                    gradient.add_color_stop_rgb(step / steps, *self.background_color)
+                    continue
+                # -95 dBm and below is clean, -40 dBm and above is congested
+                level = min(max((power + 95) / 55, 0), 1)
+                gradient.add_color_stop_rgb(step / steps, level * 90 / 255, (1 - level) * 40 / 255, 0)
+            self.shading = (key, gradient)
+        cr.set_source(gradient)
+        cr.rectangle(ruler_left, 0, ruler_right - ruler_left, ruler_y)
+        cr.fill()
+
+    def draw_ruler(self, cr, ruler):
+        ruler_left, ruler_right, ruler_y, tick_x, tick_freq = ruler
+        cr.set_source_rgb(*self.foreground_color)
+        cr.set_line_width(2)
+        # Draw main ruler line
+        cr.move_to(ruler_left, ruler_y)
+        cr.line_to(ruler_right, ruler_y)
+        # Draw ticks
+        for pos_x in tick_x:
+            cr.move_to(pos_x, ruler_y - 10)
+            cr.line_to(pos_x, ruler_y + 10)
+        cr.stroke()
+
+        # Draw frequency labels
+        for pos_x, freq in zip(tick_x, tick_freq):
+            self.draw_centered_text(cr, str(int(freq)), pos_x, ruler_y + 25, self.foreground_color)
+
+    def draw_outlines(self, cr, geometry, width):
+        ruler_y = geometry['ruler'][2]
+        trapezoids = geometry['trapezoids']
+        detail = geometry['detail']
+
+        # Weak networks are merged into one outline
+        if detail < len(trapezoids):
+            spans = [(left_pos, right_pos, top_y)
+                     for left_pos, _, _, right_pos, top_y in trapezoids[detail:]]
+            points = envelope_outline(spans, width, ruler_y)
+            cr.set_source_rgb(0.5, 0.5, 0.5)
+            cr.set_line_width(1)
+            cr.move_to(*points[0])
+            for point in points[1:]:
+                cr.line_to(*point)
+            cr.stroke()
+
+        # Draw from weak to strong signals, so strong ones are on top
+        cr.set_line_width(1.5)
+        for index in range(detail - 1, -1, -1):
+            left_pos, top_left, top_right, right_pos, top_y = trapezoids[index]
+            # Trapezoid outline - 3 sides without bottom
+            cr.set_source_rgb(*self.network_color(index))
+            cr.move_to(left_pos, ruler_y)
+            cr.line_to(top_left, top_y)
+            cr.line_to(top_right, top_y)
+            cr.line_to(right_pos, ruler_y)
+            cr.stroke()
+
+    def draw_highlight(self, cr, ruler_y, color, trapezoid):
+        """Draws semi-transparent fill of selected network"""
+        left_pos, top_left, top_right, right_pos, top_y = trapezoid
+        cr.set_source_rgba(*color, 80 / 255)
+        cr.move_to(left_pos, ruler_y)
+        cr.line_to(top_left, top_y)
+        cr.line_to(top_right, top_y)
+        cr.line_to(right_pos, ruler_y)
+        cr.close_path()
+        cr.fill()
+
+    def draw_labels(self, cr, networks, geometry, width):
+        """Places SSIDs greedily from the strongest network, same as SpectrumRenderer"""
+        ascent, descent, line_height = cr.font_extents()[:3]
+        text_height = int(ascent + descent)
+        candidates = ((index, center_x, y, int(cr.text_extents(networks[index].ssid)[4]), text_height)
+                      for index, (center_x, y) in enumerate(geometry['labels'][:geometry['detail']])
+                      if networks[index].ssid != '(hidden)')
+        for index, left, top in place_labels(candidates, width, 5, int(line_height),
+                                             self.LABEL_BUCKET_WIDTH, self.LABEL_STACK_DEPTH):
+            self.draw_text(cr, networks[index].ssid, left, top, self.network_color(index),
+                           self.background_color)
+
+    def draw(self, cr, width, height, networks, selected_bssid, threshold, congestion=None):
+        """Draws networks into Cairo context in logical pixels, with
+        background shaded by ChannelCongestion if given"""
+        cr.save()
+        cr.set_source_rgb(*self.background_color)
+        cr.paint()
+        cr.select_font_face("sans-serif", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        cr.set_font_size(self.FONT_SIZE)
+
+        if not networks:
+            self.draw_centered_text(cr, "List is empty", width / 2, height / 2, self.foreground_color)
+            cr.restore()
+            return
+
+        geometry = self.compute_geometry(cr, networks, threshold, width, height)
+        ruler = geometry['ruler']
+        if congestion is not None:
+            self.draw_congestion(cr, ruler, geometry['freq_range'], congestion)
+        self.draw_ruler(cr, ruler)
+        self.draw_outlines(cr, geometry, width)
+
+        for index, network in enumerate(networks):
+            if network.bssid == selected_bssid:
+                self.draw_highlight(cr, ruler[2], self.network_color(index), geometry['trapezoids'][index])
+                break
+
+        self.draw_labels(cr, networks, geometry, width)
+        cr.restore()
+
+class SignalHistory:
+    """Per-BSSID signal history in preallocated ring buffers.
+
+    Every BSSID gets a pair of arrays with room for `capacity` samples:
+    uint32 timestamps and int8 dBm, from `array` module so it works without
+    NumPy when the Cairo renderer is used. BSSIDs that weren't seen for
+    `max_idle` seconds are evicted, and if total memory would exceed
+    `max_bytes`, the least recently seen BSSIDs are evicted first.
+    """
+    def __init__(self, capacity=720, max_idle=3600, max_bytes=16 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_idle = max_idle
+        self.max_bssids = max(max_bytes // (capacity * 5), 1)
+        # BSSID -> [timestamps, signals, samples written, last seen]
+        # ordered from least to most recently seen
+        self.entries = collections.OrderedDict()
+
+    def add_scan(self, timestamp, networks):
+        """Appends signal of every network in a scan result"""
+        timestamp = int(timestamp)
+        for network in networks:
+            bssid = network.bssid
+            entry = self.entries.get(bssid)
+            if entry is None:
+                entry = [array.array('I', bytes(4 * self.capacity)),
+                         array.array('b', bytes(self.capacity)), 0, 0]
+                self.entries[bssid] = entry
+            else:
+                self.entries.move_to_end(bssid)
+
+            position = entry[2] % self.capacity
+            entry[0][position] = timestamp
+            entry[1][position] = max(min(network.signal, 127), -128)
+            entry[2] += 1
+            entry[3] = timestamp
+
+        # Evict BSSIDs that are gone or don't fit
+        while self.entries:
+            bssid, entry = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_bssids and timestamp - entry[3] <= self.max_idle:
+                break
+            del self.entries[bssid]
+
+    def get(self, bssid):
+        """Returns (timestamps, signals) of a BSSID, oldest first"""
+        entry = self.entries.get(bssid)
+        if entry is None:
+            return array.array('I'), array.array('b')
+        timestamps, signals, written, _ = entry
+        if written <= self.capacity:
+            return timestamps[:written], signals[:written]
+        position = written % self.capacity
+        return (timestamps[position:] + timestamps[:position],
+                signals[position:] + signals[:position])
+
+class WaterfallView:
+    """Waterfall (spectrogram) of a band: frequency by time, color by signal.
+
+    Each scan becomes one row of 1 MHz bins holding the strongest signal
+    seen there. Rows are kept per band in a ring, and the rendered image is
+    scrolled by one row per scan instead of being redrawn.
+    """
+    # Frequency range shown for each band, MHz
+    BAND_LIMITS = {
+        '2.4 GHz': (2400, 2500),
+        '5 GHz': (5150, 5895),
+        '6 GHz': (5925, 7125),
+    }
+    NO_SIGNAL = -128
+
+    def __init__(self, renderer, max_rows=720):
+        self.renderer = renderer
+        self.max_rows = max_rows
+        # Band -> [rows array, rows written]
+        self.rows = {}
+        # Band -> (image Surface, rows written when it was last updated)
+        self.images = {}
+
+        # dBm + 128 -> color, from black at -100 dBm through blue, green
+        # and yellow to red at -30 dBm
+        points = numpy.array([-128, -100, -85, -70, -55, -30, 127])
+        colors = numpy.array([(0, 0, 0), (0, 0, 0), (0, 0, 255), (0, 255, 0),
+                              (255, 255, 0), (255, 0, 0), (255, 0, 0)])
+        dbm = numpy.arange(-128, 128)
+        self.palette = numpy.stack([numpy.interp(dbm, points, colors[:, c]) for c in range(3)],
+                                   axis=1).astype(numpy.uint8)
+
+    def add_scan(self, networks_by_band):
+        """Adds one row per band"""
+        for band, networks in networks_by_band.items():
+            band_min, band_max = self.BAND_LIMITS[band]
+            row = numpy.full(band_max - band_min, self.NO_SIGNAL, dtype=numpy.int8)
+            for network in networks:
+                half_bw = network.bandwidth // 2
+                left = max(network.frequency - half_bw - band_min, 0)
+                right = min(network.frequency + half_bw - band_min, len(row))
+                if left < right:
+                    numpy.maximum(row[left:right], max(min(network.signal, 127), -128),
+                                  out=row[left:right])
+
+            if band not in self.rows:
+                self.rows[band] = [numpy.full((self.max_rows, len(row)), self.NO_SIGNAL, dtype=numpy.int8), 0]
+            rows = self.rows[band]
+            rows[0][rows[1] % self.max_rows] = row
+            rows[1] += 1
+
+    def row_pixels(self, rows, width, row_height):
+        """Converts rows of bins to (width, height, 3) pixel array"""
+        bins = numpy.arange(width) * rows.shape[1] // width
+        pixels = self.palette[rows[:, bins].astype(numpy.int16) + 128]
+        return numpy.repeat(pixels, row_height, axis=0).transpose(1, 0, 2)
+
+    def draw(self, band):
+        """Draws waterfall of a band into the renderer's surface"""
+        renderer = self.renderer
+        surface = renderer.surface
+        ui_scale = renderer.ui_scale
+        surface.fill(renderer.background_color)
+
+        rows = self.rows.get(band)
+        if rows is None or band not in self.BAND_LIMITS:
+            empty_text = renderer.text_cache.render("No scans yet", renderer.foreground_color)
+            surface.blit(empty_text, empty_text.get_rect(center=(renderer.width // 2, renderer.height // 2)))
+            return
+
+        ruler_y = renderer.height - 40 * ui_scale
+        ruler_left = 25 * ui_scale
+        ruler_right = renderer.width - 25 * ui_scale
+        image_size = (ruler_right - ruler_left, ruler_y - 5 * ui_scale)
+        row_height = 4 * ui_scale
+        rows_array, written = rows
+
+        image, drawn = self.images.get(band, (None, 0))
+        if image is None or image.get_size() != image_size or written - drawn >= image_size[1] // row_height:
+            # Full render, newest row on top
+            image = pygame.Surface(image_size)
+            visible = min(written, image_size[1] // row_height, self.max_rows)
+            if visible:
+                order = (written - 1 - numpy.arange(visible)) % self.max_rows
+                pygame.surfarray.blit_array(image.subsurface((0, 0, image_size[0], visible * row_height)),
+                                            self.row_pixels(rows_array[order], image_size[0], row_height))
+        else:
+            # Shift image down and add only the new rows on top
+            for i in range(drawn, written):
+                image.scroll(0, row_height)
+                pygame.surfarray.blit_array(image.subsurface((0, 0, image_size[0], row_height)),
+                                            self.row_pixels(rows_array[i % self.max_rows][None, :],
+                                                            image_size[0], row_height))
+        self.images[band] = (image, written)
+        surface.blit(image, (ruler_left, ruler_y - image_size[1]))
+
+        # Frequency ruler with labels at band edges and every 20 MHz between them
+        band_min, band_max = self.BAND_LIMITS[band]
+        pygame.draw.line(surface, renderer.foreground_color,
+                         (ruler_left, ruler_y), (ruler_right, ruler_y), 2 * ui_scale)
+        step = 20 if band_max - band_min <= 200 else 100
+        for freq in range(band_min, band_max + 1, step):
+            pos_x = ruler_left + (freq - band_min) * image_size[0] // (band_max - band_min)
+            pygame.draw.line(surface, renderer.foreground_color,
+                             (pos_x, ruler_y), (pos_x, ruler_y + 10 * ui_scale), 2 * ui_scale)
+            freq_text = renderer.text_cache.render(str(freq), renderer.foreground_color)
+            surface.blit(freq_text, freq_text.get_rect(center=(pos_x, ruler_y + 25 * ui_scale)))
+
+# Channel number -> center frequency of 20 MHz channels to choose from, MHz
+CANDIDATE_CHANNELS = {
+    '2.4 GHz': {**{channel: 2407 + 5 * channel for channel in range(1, 14)}, 14: 2484},
+    '5 GHz': {channel: 5000 + 5 * channel for channel in
+              [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128,
+               132, 136, 140, 144, 149, 153, 157, 161, 165]},
+    '6 GHz': {channel: 5950 + 5 * channel for channel in range(1, 234, 4)},
+}
+
+class ChannelCongestion:
+    """Overlap and congestion of candidate channels of a band.
+
+    Networks are indexed by their (frequency ± bandwidth / 2) ranges: sorted
+    range edges, and the integral of signal power spread evenly over each
+    range, built with one sweep over the edges. A channel is then scored
+    with a few bisects, so n networks and m channels cost O((n + m) log n)
+    instead of comparing every channel with every network.
+    """
+    def __init__(self, band, networks, frequencies=None, channel_width=20):
+        # Only channels the device can use are candidates, if known
+        self.channels = {channel: freq for channel, freq in CANDIDATE_CHANNELS.get(band, {}).items()
+                         if not frequencies or freq in frequencies}
+        self.channel_width = channel_width
+        self.starts = sorted(network.frequency - network.bandwidth / 2 for network in networks)
+        self.ends = sorted(network.frequency + network.bandwidth / 2 for network in networks)
+
+        # Power density changes at range edges, mW per MHz
+        events = []
+        for network in networks:
+            if network.bandwidth > 0:
+                density = 10 ** (network.signal / 10) / network.bandwidth
+                events.append((network.frequency - network.bandwidth / 2, density))
+                events.append((network.frequency + network.bandwidth / 2, -density))
+        events.sort()
+
+        # Sweep: at points[i] integral of power equals integrals[i], and
+        # power density up to the next point is densities[i]
+        self.points = []
+        self.integrals = []
+        self.densities = []
+        integral = density = 0.0
+        for freq, change in events:
+            if self.points:
+                integral += density * (freq - self.points[-1])
+            if self.points and self.points[-1] == freq:
+                self.densities[-1] += change
+            else:
+                self.points.append(freq)
+                self.integrals.append(integral)
+                self.densities.append(density + change)
+            density = self.densities[-1]
+
+    def integral(self, freq):
+        """Returns power of all networks below freq, mW"""
+        i = bisect.bisect_right(self.points, freq) - 1
+        if i < 0:
+            return 0.0
+        return self.integrals[i] + self.densities[i] * (freq - self.points[i])
+
+    def power(self, center_freq, width=None):
+        """Returns power of networks within a channel, dBm, None if there are none"""
+        half_width = (width or self.channel_width) / 2
+        power = self.integral(center_freq + half_width) - self.integral(center_freq - half_width)
+        # Tiny negative values are rounding errors
+        return 10 * math.log10(power) if power > 1e-15 else None
+
+    def overlaps(self, center_freq, width=None):
+        """Returns number of networks overlapping a channel"""
+        half_width = (width or self.channel_width) / 2
+        return (bisect.bisect_left(self.starts, center_freq + half_width) -
+                bisect.bisect_right(self.ends, center_freq - half_width))
+
+    def scores(self):
+        """Returns [(channel, frequency, overlaps, power dBm or None), ...] of candidate channels"""
+        return [(channel, freq, self.overlaps(freq), self.power(freq))
+                for channel, freq in self.channels.items()]
+
+    def best_channels(self, count=3):
+        """Returns scores of least congested channels, best first"""
+        def congestion(score):
+            _, _, overlaps, power = score
+            return (-math.inf if power is None else power, overlaps)
+        return sorted(self.scores(), key=congestion)[:count]
+
+# Everything a frame is drawn from. Networks lists are never modified once
+# shown, new scan results and thresholds make new lists.
+FrameRequest = collections.namedtuple('FrameRequest',
+                                      'networks selected_bssid threshold congestion band waterfall size')
+
+class RenderThread(threading.Thread):
+    """Draws frames on its own thread, so GTK main loop doesn't wait for them.
+
+    The thread owns the renderer and the waterfall. request() hands it a
+    FrameRequest, and only the latest request is drawn. The frame goes to
+    the renderer buffer that isn't shown, then it's passed to deliver(frame,
+    generation) as (Cairo surface, width, height, scale). The next frame
+    isn't started until the main thread calls frame_shown(surface), so a
+    shown buffer is never drawn into.
+    """
+    def __init__(self, renderer, waterfall, deliver):
+        super().__init__(daemon=True)
+        self.renderer = renderer
+        self.waterfall = waterfall
+        self.deliver = deliver
+        self.condition = threading.Condition()
+        self.pending = None
+        self.generation = 0
+        self.scans = []
+        self.in_flight = False
+        self.front = None
+
+    def request(self, frame_request):
+        """Asks for a frame, replaces one that wasn't started yet. Returns its generation."""
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, frame_request)
+            self.condition.notify()
+            return self.generation
+
+    def add_scan(self, networks_by_band):
+        """Adds waterfall rows before the next frame"""
+        with self.condition:
+            self.scans.append(networks_by_band)
+            self.condition.notify()
+
+    def frame_shown(self, cairo_surface):
+        """Main thread is done with the delivered frame, cairo_surface is shown now"""
+        with self.condition:
+            self.in_flight = False
+            self.front = cairo_surface
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.scans and (self.pending is None or self.in_flight):
+                    self.condition.wait()
+                scans, self.scans = self.scans, []
+                job = None
+                if self.pending is not None and not self.in_flight:
+                    job, self.pending = self.pending, None
+                    self.in_flight = True
+                front = self.front
+
+            for networks_by_band in scans:
+                self.waterfall.add_scan(networks_by_band)
+            if job is None:
+                continue
+
+            generation, frame_request = job
+            try:
+                frame = self.render(frame_request, front)
+            except Exception as e:
+                print(f"RenderThread.run() - {e}")
+                frame = None
+            self.deliver(frame, generation)
+
+    def render(self, frame_request, front):
+        renderer = self.renderer
+        width, height, scale = frame_request.size
+        if (width, height, scale) != (renderer.width, renderer.height, renderer.ui_scale):
+            renderer.resize(width, height, scale)
+        renderer.select_buffer(1 if renderer.buffers[0][0] is front else 0)
+
+        with pipeline_stats.stage('draw'):
+            if frame_request.waterfall:
+                self.waterfall.draw(frame_request.band)
+            else:
+                renderer.draw(frame_request.networks, frame_request.selected_bssid,
+                              frame_request.threshold, frame_request.congestion)
+        return renderer.cairo_surface, width, height, scale
+
+def merge_scan_results(results):
+    """Merges [(device, networks), ...] into one list deduplicated by BSSID.
+
+    Keeps the observation with the strongest signal, with 'device' naming
+    the radio it came from and 'seen_by' listing all radios that saw it.
+    """
+    merged = {}
+    for device_name, networks in results:
+        for network in networks:
+            bssid = network.bssid
+            best = merged.get(bssid)
+            if best is None:
+                network.seen_by = [device_name]
+                merged[bssid] = network
+                continue
+            seen_by = best.seen_by + [device_name]
+            if network.signal > best.signal:
+                merged[bssid] = network
+            merged[bssid].seen_by = seen_by
+    return list(merged.values())
+
+def scan_device(backend, device_name, frequencies=None):
+    """Scans one device, timed as 'scan' stage"""
+    with pipeline_stats.stage('scan'):
+        return backend.scan(device_name, frequencies)
+
+def scan_devices(backend, devices, executor=None, frequencies=None):
+    """Scans devices, in parallel if there are several, returns merged networks.
+    frequencies is optional {device: [frequencies to scan]}."""
+    frequencies = frequencies or {}
+    if len(devices) == 1:
+        networks = scan_device(backend, devices[0], frequencies.get(devices[0]))
+        for network in networks:
+            # Replayed networks already know their device
+            network.device = network.device or devices[0]
+        return networks
+
+    futures = [(device_name, executor.submit(scan_device, backend, device_name, frequencies.get(device_name)))
+               for device_name in devices]
+    results = []
+    errors = []
+    for device_name, future in futures:
+        try:
+            networks = future.result()
+        except Exception as e:
+            errors.append(f"{device_name}: {e}")
+            continue
+        for network in networks:
+            network.device = device_name
+        results.append((device_name, networks))
+
+    # One failing radio shouldn't hide what the others found
+    if errors and not results:
+        raise ScanError("; ".join(errors))
+    for error in errors:
+        print(f"scan_devices() - {error}", file=sys.stderr)
+    return merge_scan_results(results)
+
+class ScanRateController:
+    """Decides how long to wait before the next scan.
+
+    The wait is derived from the measured duration of the last scan, so that
+    scanning takes `duty_cycle` of the time but never runs more often than
+    once per `min_period` seconds. Failed scans back off exponentially, e.g.
+    when the driver answers EBUSY because another scan is going on.
+    """
+    # Mode -> (duty cycle, minimal scan period in seconds)
+    MODES = {
+        "normal": (0.5, 5.0),
+        "fast": (1.0, 0.0),
+        "low-power": (0.05, 30.0),
+    }
+    MIN_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, mode="normal", min_period=None):
+        self.mode = mode
+        self.min_period = min_period
+        self.backoff = 0.0
+        # Completion times of recent successful scans, for rate reporting
+        self.completed = collections.deque(maxlen=10)
+
+    def scan_finished(self, duration, error=None):
+        """Records scan result, returns delay before the next scan in seconds"""
+        if error is not None:
+            self.backoff = min(max(self.backoff * 2, self.MIN_BACKOFF), self.MAX_BACKOFF)
+            if isinstance(error, OSError) and error.errno == errno.EBUSY:
+                # Someone else is scanning, their results will be ready soon anyway
+                return self.backoff
+            return max(self.backoff, self.next_delay(duration))
+
+        self.backoff = 0.0
+        self.completed.append(time.monotonic())
+        return self.next_delay(duration)
+
+    def next_delay(self, duration):
+        duty_cycle, min_period = self.MODES[self.mode]
+        if self.min_period is not None:
+            min_period = self.min_period
+        return max(duration / duty_cycle, min_period) - duration
+
+    def scans_per_minute(self):
+        """Returns achieved scan rate over recent scans, or None"""
+        if len(self.completed) < 2:
+            return None
+        elapsed = self.completed[-1] - self.completed[0]
+        return (len(self.completed) - 1) * 60 / elapsed if elapsed > 0 else None
+
+class BandScanScheduler:
+    """Decides which bands each scan covers.
+
+    "all" scans everything every time, "current" only the band of the active
+    tab, and "rotating" scans the active band every time plus one of the
+    other bands, in turn, every `other_band_period` scans.
+    """
+    MODES = ["all", "current", "rotating"]
+
+    def __init__(self, mode="all", other_band_period=3):
+        self.mode = mode
+        self.other_band_period = other_band_period
+        self.scan_count = 0
+        self.next_other = 0
+
+    def next_bands(self, current_band, bands):
+        """Returns list of bands to scan next, or None for a full scan"""
+        if self.mode == "all" or current_band not in bands:
+            return None
+        if self.mode == "current":
+            return [current_band]
+
+        self.scan_count += 1
+        others = [band for band in sorted(bands) if band != current_band]
+        if not others or self.scan_count % self.other_band_period:
+            return [current_band]
+        other = others[self.next_other % len(others)]
+        self.next_other += 1
+        return [current_band, other]
+
+# Device dropdown entry for scanning all devices at once
+ALL_DEVICES = "(all devices)"
+
+class HeadlessScanner:
+    """Scan loop without GUI, writes every network seen as JSON line or CSV row"""
+    FIELDS = ['timestamp', 'device', 'bssid', 'ssid', 'channel', 'frequency', 'bandwidth', 'signal']
+
+    def __init__(self, backend, devices, output, output_format='jsonl',
+                 rate_controller=None, count=0, scan_log=None, frequencies=None,
+                 stats_path=None, stats_interval=10.0, publisher=None):
+        self.backend = backend
+        self.devices = devices
+        self.frequencies = frequencies
+        self.rate_controller = rate_controller or ScanRateController()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(devices))
+        self.output = output
+        self.output_format = output_format
+        self.count = count
+        self.scan_log = scan_log
+        self.stats_path = stats_path
+        self.stats_interval = stats_interval
+        self.publisher = publisher
+        if output_format == 'csv' and output:
+            self.csv_writer = csv.DictWriter(output, fieldnames=self.FIELDS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+
+    def write_scan(self, timestamp, networks):
+        if self.output is None:
+            return
+        for network in networks:
+            record = dict(network.to_dict(), timestamp=round(timestamp, 3))
+            if self.output_format == 'csv':
+                self.csv_writer.writerow(record)
+            else:
+                self.output.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.output.flush()
+
+    def run(self):
+        scans = 0
+        stats_due = time.monotonic() + self.stats_interval
+        while not self.count or scans < self.count:
+            started = time.monotonic()
+            try:
+                networks = scan_devices(self.backend, self.devices, self.executor, self.frequencies)
+            except EndOfScanLog:
+                break
+            except Exception as e:
+                print(f"HeadlessScanner.run() - {e}", file=sys.stderr)
+                delay = self.rate_controller.scan_finished(time.monotonic() - started, e)
+            else:
+                delay = self.rate_controller.scan_finished(time.monotonic() - started)
+                timestamp = get_scan_timestamp(self.backend)
+                if self.scan_log:
+                    self.scan_log.append(timestamp, networks)
+                self.write_scan(timestamp, networks)
+                if self.publisher:
+                    self.publisher.publish(timestamp, networks)
+                scans += 1
+            if self.stats_path and time.monotonic() >= stats_due:
+                pipeline_stats.export(self.stats_path)
+                stats_due = time.monotonic() + self.stats_interval
+            time.sleep(delay)
+        if self.stats_path:
+            pipeline_stats.export(self.stats_path)
+
+def run_headless(args, backend):
+    """Entry point of --headless mode"""
+    if args.interface and args.interface != 'all':
+        devices = args.interface.split(',')
+    else:
+        try:
+            devices = backend.get_devices()
+        except Exception as e:
+            print(f"run_headless() - {e}", file=sys.stderr)
+            devices = []
+        if not devices:
+            print("No Wi-Fi devices found", file=sys.stderr)
+            return 1
+        if not args.interface:
+            devices = devices[:1]
+
+    # Restrict scans to given bands, e.g. "2.4,5"
+    frequencies = None
+    if args.bands:
+        bands = [f"{band.strip()} GHz" for band in args.bands.split(',')]
+        frequencies = {}
+        for device_name in devices:
+            band_frequencies = backend.get_band_frequencies(device_name)
+            frequencies[device_name] = [freq for band in bands for freq in band_frequencies.get(band, [])]
+
+    # Sensor only writes output if asked to
+    if args.output:
+        output = open(args.output, 'a', newline='')
+    else:
+        output = None if args.publish else sys.stdout
+    scan_log = ScanLogWriter(args.record) if args.record else None
+    publisher = SensorPublisher(args.publish, args.sensor_name) if args.publish else None
+    # Replayed and collected scans are paced by the backend
+    if args.replay or args.collect:
+        rate_controller = ScanRateController("fast")
+    else:
+        rate_controller = ScanRateController(args.rate, args.interval)
+    scanner = HeadlessScanner(backend, devices, output, args.format,
+                              rate_controller, args.count, scan_log, frequencies,
+                              args.stats_file, args.stats_interval, publisher)
+    try:
+        scanner.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scanner.executor.shutdown(wait=False)
+        if publisher:
+            publisher.close()
+        if scan_log:
+            scan_log.close()
+        if output and output is not sys.stdout:
+            output.close()
+    return 0
+
+def generate_iw_scan(count, seed=0, device_name='wlan0'):
+    """Generates `iw dev xxx scan` output with count BSSes on 2.4, 5 and 6 GHz.
+
+    Has what real scans have: hidden SSIDs (empty and zeroed), long IE dumps
+    and every channel width notation parse_scan_results() knows about.
+    """
+    rng = random.Random(seed)
+    channels = [(band, channel, freq) for band, band_channels in CANDIDATE_CHANNELS.items()
+                for channel, freq in band_channels.items()]
+    names = ['HomeNet', 'Office', 'Guest', 'eduroam', 'CoffeeShop', 'DIRECT-printer', 'IoT', 'Conference']
+    lines = []
+    for i in range(count):
+        band, channel, freq = rng.choice(channels)
+        bssid = f"02:{rng.randrange(256):02x}:{rng.randrange(256):02x}:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}"
+        kind = rng.random()
+        if kind < 0.08:
+            ssid = ''
+        elif kind < 0.1:
+            ssid = '\\x00' * 8
+        else:
+            ssid = f"{rng.choice(names)}-{i}"
+
+        lines += [
+            f"BSS {bssid}(on {device_name})" + (" -- associated" if i == 0 else ""),
+            f"\tlast seen: {rng.randrange(100000)}.{rng.randrange(1000):03d}s [boottime]",
+            f"\tTSF: {rng.randrange(10 ** 12)} usec (0d, 01:02:03)",
+            f"\tfreq: {freq}.0",
+            "\tbeacon interval: 100 TUs",
+            "\tcapability: ESS Privacy ShortSlotTime RadioMeasure (0x1411)",
+            f"\tsignal: {-rng.randint(30, 95)}.00 dBm",
+            f"\tlast seen: {rng.randrange(10000)} ms ago",
+            f"\tSSID: {ssid}",
+            "\tSupported rates: 6.0* 9.0 12.0* 18.0 24.0* 36.0 48.0 54.0 ",
+            f"\tDS Parameter set: channel {channel}",
+            "\tRSN:\t * Version: 1",
+            "\t\t * Group cipher: CCMP",
+            "\t\t * Pairwise ciphers: CCMP",
+            "\t\t * Authentication suites: PSK SAE",
+            "\t\t * Capabilities: 16-PTKSA-RC 1-GTKSA-RC MFP-capable (0x008c)",
+        ]
+        if band == '6 GHz':
+            lines += [
+                "\tHE capabilities:",
+                "\t\tHE MAC Capabilities (0x000801185018):",
+                "\t\t\t+HTC HE Supported",
+                "\t\tHE PHY Capabilities: (0x0e3f0200fd09800ecf0e00):",
+                "\t\t\tHE40/HE80/5GHz",
+                "\tHE Operation:",
+                "\t\tHE Operation Parameters: (0x023ffc)",
+                "\t\t6 GHz Operation Information",
+                f"\t\t\t * primary channel: {channel}",
+                f"\t\t\t * channel width: {rng.choice(['0 (20 or 40 MHz)', '1 (80 MHz)', '2 (160 MHz)'])}",
+            ]
+        else:
+            sta_width = rng.choice(['20 MHz', 'any'])
+            lines += [
+                "\tHT capabilities:",
+                "\t\tCapabilities: 0x9ef",
+                "\t\t\tRX LDPC",
+                "\t\t\tHT20/HT40",
+                "\t\t\tSM Power Save disabled",
+                "\t\t\tRX HT20 SGI",
+                "\t\t\tRX HT40 SGI",
+                "\t\tMaximum RX AMPDU length 65535 bytes (exponent: 0x003)",
+                "\t\tHT RX MCS rate indexes supported: 0-23",
+                "\tHT operation:",
+                f"\t\t * primary channel: {channel}",
+                "\t\t * secondary channel offset: above",
+                f"\t\t * STA channel width: {sta_width}",
+                "\t\t * RIFS: 0",
+            ]
+            if band == '5 GHz' and sta_width == 'any':
+                lines += [
+                    "\tVHT capabilities:",
+                    "\t\tVHT Capabilities (0x0f8259b2):",
+                    "\t\t\tMax MPDU length: 11454",
+                    "\t\t\tSupported Channel Width: neither 160 nor 80+80",
+                    "\tVHT operation:",
+                    f"\t\t * channel width: {rng.choice(['0 (20 or 40 MHz)', '1 (80 MHz)', '2 (160 MHz)'])}",
+                    "\t\t * center freq segment 1: 42",
+                    "\t\t * center freq segment 2: 0",
+                    "\t\t * VHT basic MCS set: 0xfffc",
+                ]
+        lines += [
+            "\tExtended capabilities:",
+            "\t\t * Extended Channel Switching",
+            "\t\t * BSS Transition",
+            "\t\t * Operating Mode Notification",
+            "\tWMM:\t * Parameter version 1",
+            "\t\t * BE: CW 15-1023, AIFSN 3",
+            "\t\t * BK: CW 15-1023, AIFSN 7",
+            "\t\t * VI: CW 7-15, AIFSN 2, TXOP 3008 usec",
+            "\t\t * VO: CW 3-7, AIFSN 2, TXOP 1504 usec",
+        ]
+        if rng.random() < 0.2:
+            lines += [
+                "\tWPS:\t * Version: 1.0",
+                "\t\t * Wi-Fi Protected Setup State: 2 (Configured)",
+                "\t\t * Response Type: 3 (AP)",
+                f"\t\t * UUID: {rng.randrange(16 ** 32):032x}",
+                "\t\t * Manufacturer: Vendor",
+                "\t\t * Model: Router",
+                "\t\t * Device name: Router",
+                "\t\t * Config methods: Display, Keypad",
+            ]
+    return '\n'.join(lines) + '\n'
+
+def generate_iw_phy_info(wiphy=0, disabled_share=0.1, seed=0):
+    """Generates `iw phy phyX info` output with 2.4, 5 and 6 GHz bands"""
+    rng = random.Random(seed)
+    lines = [f"Wiphy phy{wiphy}", f"\twiphy index: {wiphy}", "\tmax # scan SSIDs: 4"]
+    for number, (band, band_channels) in enumerate(CANDIDATE_CHANNELS.items(), 1):
+        lines += [
+            f"\tBand {number}:",
+            "\t\tCapabilities: 0x1ff",
+            "\t\t\tRX LDPC",
+            "\t\t\tHT20/HT40",
+            "\t\tBitrates (non-HT):",
+            "\t\t\t* 6.0 Mbps",
+            "\t\t\t* 54.0 Mbps",
+            "\t\tFrequencies:",
+        ]
+        for channel, freq in band_channels.items():
+            if rng.random() < disabled_share:
+                lines.append(f"\t\t\t* {freq}.0 MHz [{channel}] (disabled)")
+            else:
+                lines.append(f"\t\t\t* {freq}.0 MHz [{channel}] (22.0 dBm)" +
+                             (" (no IR, radar detection)" if band == '5 GHz' and 52 <= channel <= 144 else ""))
+    lines += ["\tSupported commands:", "\t\t * new_interface", "\t\t * trigger_scan"]
+    return '\n'.join(lines) + '\n'
+
+def group_networks_by_band(networks, bands=None):
+    """Returns {band: networks sorted by descending signal}, only given bands if any"""
+    networks_by_band = {band: [] for band in FREQUENCY_BANDS}
+    for network in networks:
+        band = get_frequency_band(network.frequency)
+        if band:
+            networks_by_band[band].append(network)
+
+    if bands:
+        networks_by_band = {band: networks_by_band[band] for band in bands if band in networks_by_band}
+    for band_networks in networks_by_band.values():
+        band_networks.sort(key=lambda x: x.signal, reverse=True)
+    return networks_by_band
+
+def time_benchmark(func, min_time=0.2, min_runs=3):
+    """Runs func repeatedly, returns (median, best) time in milliseconds"""
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - started < min_time:
+        run_started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - run_started)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[0] * 1000
+
+def run_benchmark(args):
+    """Entry point of --benchmark mode, times hot paths on synthetic scans"""
+    global cairo
+    sizes = [int(size) for size in args.benchmark_sizes.split(',')]
+    backend = IwBackend()
+    phy_info = generate_iw_phy_info()
+
+    try:
+        import_render_modules()
+        renderer = SpectrumRenderer()
+        renderer.resize(1600, 300)
+    except Exception as e:
+        print(f"run_benchmark() - drawing is skipped: {e}", file=sys.stderr)
+        renderer = None
+
+    # Cairo renderer doesn't need PyGame and NumPy, so it's timed on its own
+    try:
+        import cairo
+        vector_renderer = CairoSpectrumRenderer()
+        vector_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1600, 300)
+    except Exception as e:
+        print(f"run_benchmark() - Cairo drawing is skipped: {e}", file=sys.stderr)
+        vector_renderer = None
+
+    # `iw phy info` doesn't depend on number of BSSes
+    median, best = time_benchmark(lambda: backend.parse_phy_info_results(phy_info))
+    results = {'parse_phy': {'median_ms': round(median, 4), 'best_ms': round(best, 4)}}
+    for size in sizes:
+        scan_output = generate_iw_scan(size)
+        networks = backend.parse_scan_results(scan_output)
+
+        def group_and_filter():
+            for band_networks in group_networks_by_band(networks).values():
+                negated_signals = [-network.signal for network in band_networks]
+                band_networks[:bisect.bisect_right(negated_signals, 75)]
+
+        cases = {
+            'parse_scan': lambda: backend.parse_scan_results(scan_output),
+            'group_filter': group_and_filter,
+        }
+        if renderer:
+            band_networks = max(group_networks_by_band(networks).values(), key=len)
+
+            def draw():
+                # Cold frame, as after a scan: nothing cached but glyphs
+                renderer.invalidate()
+                renderer.draw(band_networks, band_networks[len(band_networks) // 2].bssid if band_networks else None, -100)
+
+            cases['draw'] = draw
+        if vector_renderer:
+            band_networks = max(group_networks_by_band(networks).values(), key=len)
+
+            def draw_cairo():
+                # Comparable to draw + convert: the frame ends up in a Cairo surface
+                vector_renderer.invalidate()
+                vector_renderer.draw(cairo.Context(vector_surface), 1600, 300, band_networks,
+                                     band_networks[len(band_networks) // 2].bssid if band_networks else None, -100)
+
+            cases['draw_cairo'] = draw_cairo
+
+        for case, func in cases.items():
+            median, best = time_benchmark(func)
+            results[f"{case}/{size}"] = {'median_ms': round(median, 4), 'best_ms': round(best, 4)}
+
+    if renderer:
+        # Handing a frame over to Cairo depends on resolution only. convert_copy
+        # is how it was done before PyGame drew into Cairo's buffer.
+        for width, height in [(800, 300), (1600, 300), (3200, 600), (3840, 2160)]:
+            renderer.resize(width, height)
+            surface = renderer.surface
+
+            def convert_copy():
+                pixels = numpy.transpose(pygame.surfarray.array3d(surface), (1, 0, 2))
+                rgba = numpy.empty((height, width, 4), dtype=numpy.uint8)
+                rgba[:, :, :3] = pixels
+                rgba[:, :, 3] = 255
+                rgba.tobytes()
+
+            for case, func in (('convert_copy', convert_copy), ('convert', renderer.cairo_surface.mark_dirty)):
+                median, best = time_benchmark(func)
+                results[f"{case}/{width}x{height}"] = {'median_ms': round(median, 4), 'best_ms': round(best, 4)}
+
+    baseline = {}
+    if args.benchmark_baseline:
+        with open(args.benchmark_baseline) as f:
+            baseline = json.load(f)['results']
+
+    # Slower than baseline by more than this is a regression
+    tolerance = 1.2
+    regressions = 0
+    print(f"{'case':<24} {'median ms':>10} {'best ms':>10} {'vs baseline':>12}")
+    for name, result in results.items():
+        line = f"{name:<24} {result['median_ms']:>10.3f} {result['best_ms']:>10.3f}"
+        if name in baseline:
+            ratio = result['median_ms'] / max(baseline[name]['median_ms'], 1e-6)
+            line += f" {ratio:>11.2f}x"
+            # Sub-10 µs cases are timer noise
+            if ratio > tolerance and result['median_ms'] > 0.01:
+                line += " SLOWER"
+                regressions += 1
+        print(line)
+
+    # Cairo renderer against PyGame renderer plus handing its frame to Cairo
+    for size in sizes:
+        if f"draw/{size}" in results and f"draw_cairo/{size}" in results and 'convert/1600x300' in results:
+            pygame_ms = results[f"draw/{size}"]['median_ms'] + results['convert/1600x300']['median_ms']
+            ratio = results[f"draw_cairo/{size}"]['median_ms'] / max(pygame_ms, 1e-6)
+            print(f"draw_cairo/{size} vs draw/{size} + convert: {ratio:.2f}x")
+
+    if args.benchmark_save:
+        with open(args.benchmark_save, 'w') as f:
+            json.dump({'timestamp': round(time.time(), 3), 'python': sys.version.split()[0],
+                       'results': results}, f, indent=2)
+    return 1 if regressions else 0
+
+def import_render_modules():
+    """Imports modules SpectrumRenderer needs"""
+    global pygame, numpy, cairo
+    import pygame
+    import numpy
+    import cairo
+
+def import_gui_modules(renderer='pygame'):
+    """Imports modules needed only by GUI, so headless mode starts without them.
+    Cairo renderer doesn't need PyGame and NumPy."""
+    global gi, Gtk, GLib, Gdk, cairo
+    if renderer == 'cairo':
+        import cairo
+    else:
+        import_render_modules()
+    import gi
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import Gtk, GLib, Gdk
+
+class WirelessExplorer:
+    def __init__(self, record_path=None, replay_path=None, replay_speed=1.0, replay_start=0.0,
+                 stats_path=None, stats_interval=10.0, renderer_name='pygame', collect_address=None,
+                 rate='normal', interval=None):
+        if renderer_name == 'cairo':
+            # Spectrum view drawn by on_draw with vector operations,
+            # there is no render thread and no waterfall
+            self.renderer = CairoSpectrumRenderer()
+            self.waterfall = None
+            self.render_thread = None
+            self.surface_size = None
+        else:
+            # Spectrum view, drawn on render thread into surfaces shown by drawing_area
+            self.renderer = SpectrumRenderer()
+            self.waterfall = WaterfallView(self.renderer)
+            self.render_thread = RenderThread(self.renderer, self.waterfall, self._deliver_frame)
+            self.render_thread.start()
+            # Size requested frames are drawn at, (width, height, scale)
+            self.surface_size = (self.renderer.width, self.renderer.height, self.renderer.ui_scale)
+        # FrameRequest on_draw draws with Cairo renderer
+        self.vector_frame = None
+        self.resize_timer_id = None
+        # Generation of the last requested frame, and (Cairo surface, width,
+        # height, scale) of the frame being shown
+        self.latest_generation = 0
+        self.front_frame = None
+        # Redraws are requested by events and done once per frame
+        self.redraw_tick_id = None
+        self.redraw_counters = collections.Counter(requested=0, rendered=0, coalesced=0, dropped=0)
 
         # Scanning state
         self.scanning_enabled = False
@@ -74,10 +2825,57 @@ class WirelessExplorer:
 
         # Network data storage for each tab
         self.tab_networks_data = {}
+        # Tab index -> (all networks of last scan sorted by descending signal,
+        # their negated signals for bisect), to re-apply threshold instantly
+        self.tab_scan_results = {}
+        # Band -> ChannelCongestion of last scan of the band
+        self.band_congestion = {}
+        # Tab index -> {BSSID: [Gtk.TreeRowReference, row data]} of rows in its table
+        self.tab_row_refs = {}
+
+        # Signal of every BSSID over the last hour
+        self.signal_history = SignalHistory()
+
+        # Source of device information and scan results
+        if replay_path:
+            self.backend = ReplayBackend(replay_path, replay_speed, replay_start)
+            # Replayed scans are paced by the backend
+            self.rate_controller = ScanRateController("fast")
+        elif collect_address:
+            self.backend = CollectorBackend(collect_address)
+            # Sensors decide how often they scan
+            self.rate_controller = ScanRateController("fast")
+        else:
+            self.backend = create_scan_backend()
+            self.rate_controller = ScanRateController(rate, interval)
+        self.scan_started = 0.0
+        # Duration of the last scan and when it finished, to reschedule on rate change
+        self.scan_duration = 0.0
+        self.scan_ended = 0.0
+
+        # Bands supported by devices
+        self.phy_cache = PhyInfoCache()
+
+        # Restricts scans to some of the bands
+        self.band_scheduler = BandScanScheduler()
+
+        # Devices found by discover_devices(), scanned in parallel in "(all devices)" mode
+        self.wifi_devices = []
+        self.scan_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+        # Log every scan result if recording
+        self.scan_log = ScanLogWriter(record_path) if record_path else None
+
+        # Stage timings overlay refresh timer and periodic export
+        self.stats_timer_id = None
+        self.stats_path = stats_path
 
         # Create GTK interface
         self.setup_gtk()
 
+        if stats_path:
+            GLib.timeout_add(int(stats_interval * 1000), self.export_stats)
+
     def setup_gtk(self):
         """Setup GTK interface"""
         self.window = Gtk.Window()
@@ -110,19 +2908,9 @@ class WirelessExplorer:
         device_label = Gtk.Label(label="Device:")
         left_hbox.pack_start(device_label, False, False, 0)
 
-        # Device dropdown list
+        # Device dropdown list, filled by discover_devices()
         self.device_combo = Gtk.ComboBoxText()
 
-        # Get and add real Wi-Fi devices
-        wifi_devices = self.get_wifi_devices()
-        if wifi_devices:
-            for device in wifi_devices:
-               self.device_combo.append_text(device)
-        else:
-            self.device_combo.append_text("(none)")
-
-        self.device_combo.set_active(0)
-
         # Connect device change handler
         self.device_combo.connect("changed", self.on_device_changed)
         left_hbox.pack_start(self.device_combo, False, False, 0)
@@ -132,9 +2920,48 @@ class WirelessExplorer:
         self.start_button.connect("clicked", self.on_start_stop_clicked)
         left_hbox.pack_start(self.start_button, False, False, 0)
 
+        # Which bands are scanned
+        scan_mode_label = Gtk.Label(label="Scan:")
+        left_hbox.pack_start(scan_mode_label, False, False, 0)
+        self.scan_mode_combo = Gtk.ComboBoxText()
+        self.scan_mode_combo.append("all", "All bands")
+        self.scan_mode_combo.append("current", "Current band")
+        self.scan_mode_combo.append("rotating", "Rotating")
+        self.scan_mode_combo.set_active_id(self.band_scheduler.mode)
+        self.scan_mode_combo.connect("changed", self.on_scan_mode_changed)
+        left_hbox.pack_start(self.scan_mode_combo, False, False, 0)
+
+        # How often to scan
+        rate_label = Gtk.Label(label="Rate:")
+        left_hbox.pack_start(rate_label, False, False, 0)
+        self.rate_combo = Gtk.ComboBoxText()
+        self.rate_combo.append("normal", "Normal")
+        self.rate_combo.append("fast", "As fast as possible")
+        self.rate_combo.append("low-power", "Low power")
+        self.rate_combo.set_active_id(self.rate_controller.mode)
+        self.rate_combo.connect("changed", self.on_rate_changed)
+        left_hbox.pack_start(self.rate_combo, False, False, 0)
+
+        # Spectrum / waterfall switch
+        self.waterfall_button = Gtk.CheckButton(label="Waterfall")
+        self.waterfall_button.connect("toggled", self.on_view_mode_toggled)
+        left_hbox.pack_start(self.waterfall_button, False, False, 0)
+        if self.waterfall is None:
+            self.waterfall_button.set_sensitive(False)
+            self.waterfall_button.set_tooltip_text("Waterfall needs PyGame renderer")
+
+        # Overlay with timings of pipeline stages
+        self.stats_button = Gtk.CheckButton(label="Stats")
+        self.stats_button.connect("toggled", self.on_stats_toggled)
+        left_hbox.pack_start(self.stats_button, False, False, 0)
+
         # Right part of toolbar
         right_hbox = Gtk.HBox(spacing=5)
 
+        # Least congested channels of current band
+        self.best_channels_label = Gtk.Label()
+        right_hbox.pack_start(self.best_channels_label, False, False, 10)
+
         # Text "Threshold:"
         threshold_label = Gtk.Label(label="Threshold:")
         right_hbox.pack_start(threshold_label, False, False, 0)
@@ -142,6 +2969,7 @@ class WirelessExplorer:
         # Number input field with arrows
         threshold_adjustment = Gtk.Adjustment(value=-130, lower=-130, upper=20, step_increment=1, page_increment=10, page_size=0)
         self.threshold_spin = Gtk.SpinButton(adjustment=threshold_adjustment, climb_rate=1, digits=0)
+        self.threshold_spin.connect("value-changed", self.on_threshold_changed)
         right_hbox.pack_start(self.threshold_spin, False, False, 0)
 
         # Text "dBm"
@@ -173,6 +3001,7 @@ class WirelessExplorer:
         self.drawing_area = Gtk.DrawingArea()
         self.drawing_area.connect("draw", self.on_draw)
         self.drawing_area.connect("size-allocate", self.on_drawing_area_resize)
+        self.drawing_area.connect("notify::scale-factor", self.on_drawing_area_resize)
         self.paned.add2(self.drawing_area)
 
         # Create status bar
@@ -188,30 +3017,52 @@ class WirelessExplorer:
         # Practice shows it can work without idle_add(), but it's more reliable with it.
         GLib.idle_add(self._set_paned_position)
 
-        # Initialize tabs and call handler for initially selected device
-        # after all UI components are created
+        # Initialize tabs after all UI components are created and look for
+        # devices in background, so the window doesn't wait for them
         self.update_tabs_for_device(None)
-        self.on_device_changed(self.device_combo)
+        self.discover_devices()
 
     def get_wifi_devices(self):
         """Gets list of Wi-Fi devices in the system"""
         devices = []
         try:
-            # Try to get list via `iw dev`
-            result = subprocess.run(['iw', 'dev'], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith('Interface '):
-                        device_name = line.split()[1]
-                        devices.append(device_name)
+            devices = self.backend.get_devices()
         except Exception as e:
             print(f"get_wifi_devices() - {e}")
             pass
 
         return devices
 
+    def discover_devices(self):
+        """Starts looking for Wi-Fi devices in separate thread"""
+        self.status_bar.pop(self.status_context_id)
+        self.status_bar.push(self.status_context_id, "Looking for Wi-Fi devices...")
+
+        def discover_thread_proc():
+            devices = self.get_wifi_devices()
+            GLib.idle_add(self._devices_discovered, devices)
+
+        thread = threading.Thread(target=discover_thread_proc)
+        thread.daemon = True
+        thread.start()
+
+    def _devices_discovered(self, devices):
+        """Fills device dropdown list (called from main thread)"""
+        self.phy_cache.forget()
+        self.device_combo.remove_all()
+        self.wifi_devices = devices
+        if devices:
+            for device in devices:
+               self.device_combo.append_text(device)
+            if len(devices) > 1:
+                self.device_combo.append_text(ALL_DEVICES)
+        else:
+            self.device_combo.append_text("(none)")
+
+        # Calls on_device_changed()
+        self.device_combo.set_active(0)
+        return False  # Don't repeat this GLib.idle_add call
+
     def _set_paned_position(self):
         """Sets paned to 50:50 position"""
         height = self.window.get_allocated_height()
@@ -236,9 +3087,7 @@ class WirelessExplorer:
         if self.scanning_enabled:
             # Stop scanning
             self.scanning_enabled = False
-            if self.scan_timer_id:
-                GLib.source_remove(self.scan_timer_id)
-                self.scan_timer_id = None
+            self.schedule_next_scan(None)
             self.start_button.set_label("Start")
             self.status_bar.pop(self.status_context_id)
             self.status_bar.push(self.status_context_id, "Scanning stopped.")
@@ -247,79 +3096,266 @@ class WirelessExplorer:
             device_name = self.device_combo.get_active_text()
             if device_name and device_name != "(none)":
                 self.scanning_enabled = True
-                # Start scan timer every 5 seconds
-                self.scan_timer_id = GLib.timeout_add(5000, self.scan_wifi_networks)
                 self.start_button.set_label("Stop")
                 self.status_bar.pop(self.status_context_id)
                 self.status_bar.push(self.status_context_id, f"Scanning {device_name}...")
-                # Start first scan immediately
-                self.scan_wifi_networks()
+                # Start first scan immediately, next ones are scheduled
+                # by ScanRateController when previous one completes
+                if not self.scan_in_progress:
+                    self.scan_wifi_networks()
             else:
                 self.status_bar.pop(self.status_context_id)
                 self.status_bar.push(self.status_context_id, "Please select a device first.")
 
     def on_tab_switched(self, notebook, page, page_num):
         """Tab switch handler"""
-        # Get data for active tab and redraw surface
-        networks_data = self.tab_networks_data.get(page_num, [])
-
-        # Get selected network for specific tab
-        selected_bssid = self.get_selected_network_bssid(page_num)
-
-        # Draw with correct selection
-        self.pygame_draw_networks_with_selection(networks_data, selected_bssid)
-        self.schedule_drawing_area_update()
+        # Page becomes current after this handler, which is before the next
+        # frame, so the redraw picks up data and selection of the new tab
+        self.request_redraw()
+        self.update_best_channels(page_num)
 
     def on_draw(self, widget, cr):
         """DrawingArea draw handler"""
-        if self.current_pixbuf is None:
-            return False
-
         # Get drawing area dimensions
         area_width = widget.get_allocated_width()
         area_height = widget.get_allocated_height()
 
-        # Scale pixbuf to area dimensions
-        if area_width > 0 and area_height > 0:
-            scaled_pixbuf = self.current_pixbuf.scale_simple(
-                area_width,
-                area_height,
-                GdkPixbuf.InterpType.BILINEAR
-            )
+        if self.render_thread is None:
+            if self.vector_frame is not None and area_width > 0 and area_height > 0:
+                frame = self.vector_frame
+                with pipeline_stats.stage('draw'):
+                    self.renderer.draw(cr, area_width, area_height, frame.networks,
+                                       frame.selected_bssid, frame.threshold, frame.congestion)
+            self.draw_overlays(cr, area_width)
+            return False
 
-            # Draw scaled pixbuf
-            Gdk.cairo_set_source_pixbuf(cr, scaled_pixbuf, 0, 0)
-            cr.paint()
+        if self.front_frame is None:
+            return False
 
+        # Normally surface matches the area and is painted as is. Scaling is
+        # only needed until a pending resize is applied.
+        cairo_surface, width, height, scale = self.front_frame
+        surface_width = width / scale
+        surface_height = height / scale
+        if area_width > 0 and area_height > 0:
+            with pipeline_stats.stage('paint'):
+                cr.save()
+                if (area_width, area_height) != (surface_width, surface_height):
+                    cr.scale(area_width / surface_width, area_height / surface_height)
+                    cr.set_source_surface(cairo_surface, 0, 0)
+                    cr.get_source().set_filter(cairo.FILTER_BILINEAR)
+                else:
+                    cr.set_source_surface(cairo_surface, 0, 0)
+                cr.paint()
+                cr.restore()
+
+        self.draw_overlays(cr, area_width)
         return False
 
-    def on_drawing_area_resize(self, widget, allocation):
-        """Drawing area resize handler"""
-        self.pygame_width = max(allocation.width, 100)
-        self.pygame_height = max(allocation.height, 100)
+    def draw_overlays(self, cr, area_width):
+        """Draws signal history of selected network and stage timings over the spectrum"""
+        bssid = self.get_selected_network_bssid(self.notebook.get_current_page())
+        if bssid:
+            self.draw_signal_history(cr, bssid, area_width)
+        if self.stats_button.get_active():
+            self.draw_stats_overlay(cr)
+
+    def draw_signal_history(self, cr, bssid, area_width):
+        """Draws signal of a network over the last hour in the top right corner"""
+        timestamps, signals = self.signal_history.get(bssid)
+        if not timestamps:
+            return
 
-        # Create new surface
-        self.pygame_surface = pygame.Surface((self.pygame_width, self.pygame_height))
+        # Plot size, dBm range and time span
+        width, height = 300, 90
+        min_dbm, max_dbm = -100, -20
+        span = 3600
+        left = area_width - width - 5
+        top = 5
+        plot_top = top + 20
+        now = timestamps[-1]
+
+        def signal_y(signal):
+            signal = min(max(signal, min_dbm), max_dbm)
+            return plot_top + (max_dbm - signal) * height / (max_dbm - min_dbm)
+
+        cr.save()
+        cr.set_source_rgba(0, 0, 0, 0.7)
+        cr.rectangle(left, top, width, height + plot_top - top + 5)
+        cr.fill()
+
+        cr.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        cr.set_font_size(12)
+        cr.set_source_rgb(1, 1, 1)
+        cr.move_to(left + 5, top + 14)
+        cr.show_text(f"{bssid} {signals[-1]} dBm, last hour")
+
+        # Grid line every 20 dB
+        cr.set_source_rgba(1, 1, 1, 0.3)
+        cr.set_line_width(1)
+        for dbm in range(min_dbm + 20, max_dbm, 20):
+            cr.move_to(left, signal_y(dbm))
+            cr.line_to(left + width, signal_y(dbm))
+        cr.stroke()
+
+        cr.set_source_rgb(0, 1, 0)
+        cr.set_line_width(1.5)
+        for timestamp, signal in zip(timestamps, signals):
+            age = now - timestamp
+            if age > span:
+                continue
+            x = left + width * (1 - age / span)
+            if cr.has_current_point():
+                cr.line_to(x, signal_y(signal))
+            else:
+                cr.move_to(x, signal_y(signal))
+        cr.stroke()
+        # Latest sample, also visible when it's the only one
+        cr.arc(left + width, signal_y(signals[-1]), 2.5, 0, 2 * math.pi)
+        cr.fill()
+        cr.restore()
+
+    def draw_stats_overlay(self, cr):
+        """Draws p50/p95/max and allocations of every stage in the top left corner"""
+        summary = pipeline_stats.summary()
+        lines = ["stage        p50     p95     max  allocs"]
+        for name, stage in summary.items():
+            lines.append(f"{name:<8} {stage['p50_ms']:>7.1f} {stage['p95_ms']:>7.1f} "
+                         f"{stage['max_ms']:>7.1f} {stage['allocs_p50']:>7}")
+        counters = self.redraw_counters
+        lines.append(f"frames {counters['rendered']}, coalesced {counters['coalesced']}, "
+                     f"dropped {counters['dropped']}")
+        text_cache = self.get_text_cache_counters()
+        if text_cache:
+            lines.append(f"text cache hits {text_cache['hits']}, misses {text_cache['misses']}")
+
+        cr.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        cr.set_font_size(12)
+        line_height = 15
+        cr.set_source_rgba(0, 0, 0, 0.7)
+        cr.rectangle(5, 5, 330, line_height * len(lines) + 10)
+        cr.fill()
+        cr.set_source_rgb(1, 1, 1)
+        for i, line in enumerate(lines):
+            cr.move_to(10, 5 + line_height * (i + 1))
+            cr.show_text(line)
+
+    def on_stats_toggled(self, button):
+        """Stats overlay switch handler"""
+        if self.stats_timer_id:
+            GLib.source_remove(self.stats_timer_id)
+            self.stats_timer_id = None
+        if button.get_active():
+            self.stats_timer_id = GLib.timeout_add(1000, self._refresh_stats_overlay)
+        self.drawing_area.queue_draw()
 
-        # Redraw content for current tab
-        current_page = self.notebook.get_current_page()
-        networks_data = self.tab_networks_data.get(current_page, [])
-        self.pygame_draw_networks(networks_data)
-        self.schedule_drawing_area_update()
+    def _refresh_stats_overlay(self):
+        # Only paints the overlay again, spectrum isn't re-rendered
+        self.drawing_area.queue_draw()
+        return True  # Repeat every second while overlay is on
+
+    def get_text_cache_counters(self):
+        """Returns hits and misses of the renderer's TextCache, None if it has none"""
+        text_cache = getattr(self.renderer, 'text_cache', None)
+        if text_cache is None:
+            return None
+        return {'hits': text_cache.hits, 'misses': text_cache.misses}
+
+    def export_stats(self):
+        """Writes stage timings and counters to --stats-file"""
+        counters = {'redraws': dict(self.redraw_counters)}
+        text_cache = self.get_text_cache_counters()
+        if text_cache:
+            counters['text_cache'] = text_cache
+        try:
+            pipeline_stats.export(self.stats_path, counters)
+        except OSError as e:
+            print(f"export_stats() - {e}")
+        return True  # Continue timer
+
+    def on_drawing_area_resize(self, widget, *args):
+        """Drawing area resize and scale factor change handler"""
+        if self.render_thread is None:
+            # Vector frame is drawn at whatever size on_draw gets
+            return
+        # Dragging the paned or the window border fires size-allocate many
+        # times, so the surface is recreated once the size settles
+        if self.resize_timer_id:
+            GLib.source_remove(self.resize_timer_id)
+        self.resize_timer_id = GLib.timeout_add(100, self._apply_drawing_area_size)
+
+    def _apply_drawing_area_size(self):
+        """Makes next frames match drawing area size in device pixels"""
+        self.resize_timer_id = None
+
+        scale = self.drawing_area.get_scale_factor()
+        width = max(self.drawing_area.get_allocated_width(), 100) * scale
+        height = max(self.drawing_area.get_allocated_height(), 100) * scale
+        # Render thread recreates surfaces when it gets a frame of new size
+        self.surface_size = (width, height, scale)
+
+        # Redraw content for current tab, also if frames were dropped while
+        # resize was pending
+        self.request_redraw()
+        return False # Don't repeat this GLib.timeout_add call
 
     def update_tabs_for_device(self, device_name):
         """Updates tabs for selected device"""
+        if device_name and device_name != "(none)":
+            bands = self.phy_cache.get_memory(device_name)
+            if bands is None:
+                # Find out bands in background, show tabs when they are known
+                self.set_device_tabs(None, placeholder="(loading...)")
+
+                def bands_thread_proc():
+                    bands = self.get_device_bands(device_name)
+                    GLib.idle_add(self._device_bands_discovered, device_name, bands)
+
+                thread = threading.Thread(target=bands_thread_proc)
+                thread.daemon = True
+                thread.start()
+                return
+            self.set_device_tabs(bands)
+        else:
+            self.set_device_tabs(None)
+
+    def _device_bands_discovered(self, device_name, bands):
+        """Shows tabs for bands found by update_tabs_for_device() (called from main thread)"""
+        # Ignore result if user switched to another device meanwhile
+        if device_name == self.device_combo.get_active_text():
+            self.set_device_tabs(bands)
+        return False  # Don't repeat this GLib.idle_add call
+
+    def set_device_tabs(self, bands, placeholder="(select device)"):
+        """Creates tab for each band, or placeholder tab if bands is None"""
+        tab_labels = [self.notebook.get_tab_label_text(self.notebook.get_nth_page(i))
+                      for i in range(self.notebook.get_n_pages())]
+        if bands and tab_labels == sorted(bands):
+            # Same bands as previous device, keep tabs and just empty them
+            for tab_index in range(self.notebook.get_n_pages()):
+                self.notebook.get_nth_page(tab_index).get_child().get_model().clear()
+        else:
+            self.build_tabs(bands, placeholder)
+
+        # Clear network data and PyGame surface when changing device
+        self.tab_networks_data = {}
+        self.tab_scan_results = {}
+        self.band_congestion = {}
+        self.update_best_channels()
+        self.tab_row_refs = {}
+        self.request_redraw()
+
+    def build_tabs(self, bands, placeholder):
         # Remove all existing pages
         while self.notebook.get_n_pages() > 0:
             self.notebook.remove_page(0)
 
-        if not device_name or device_name == "(none)":
+        if bands is None:
             # If no device selected, show placeholder
             empty_label = Gtk.Label(label="")
-            tab_label = Gtk.Label(label="(select device)")
+            tab_label = Gtk.Label(label=placeholder)
             self.notebook.append_page(empty_label, tab_label)
         else:
-            bands = self.get_device_bands(device_name)
             if bands:
                 # Create tabs for each supported band
                 for freq_band in sorted(bands):
@@ -334,15 +3370,14 @@ class WirelessExplorer:
 
         self.notebook.show_all()
 
-        # Clear network data and PyGame surface when changing device
-        self.tab_networks_data = {}
-        self.pygame_draw_networks([])
-        self.schedule_drawing_area_update()
-
     def create_channels_table(self):
         """Creates scrollable channel table"""
-        # Create data model: BSSID, SSID, Channel, Frequency, Bandwidth, Signal
-        liststore = Gtk.ListStore(str, str, str, str, str, str)
+        # Create data model: BSSID, SSID, Channel, Frequency, Bandwidth, Signal, Device
+        # The last, hidden column holds signal as a number to sort by
+        liststore = Gtk.ListStore(str, str, str, str, str, str, str, int)
+
+        # Keep rows sorted by descending signal as they are inserted and updated
+        liststore.set_sort_column_id(7, Gtk.SortType.DESCENDING)
 
         # Create TreeView
         treeview = Gtk.TreeView(model=liststore)
@@ -392,6 +3427,13 @@ class WirelessExplorer:
         column_signal.set_min_width(80)
         treeview.append_column(column_signal)
 
+        # Device that saw the network
+        renderer_text = Gtk.CellRendererText()
+        column_device = Gtk.TreeViewColumn("Device", renderer_text, text=6)
+        column_device.set_resizable(True)
+        column_device.set_min_width(80)
+        treeview.append_column(column_device)
+
         # Add selection change handler
         selection = treeview.get_selection()
         selection.connect("changed", self.on_table_selection_changed)
@@ -406,91 +3448,121 @@ class WirelessExplorer:
     def on_table_selection_changed(self, selection):
         """Table selection change handler"""
         # Redraw frequency ruler with new selection
-        current_page = self.notebook.get_current_page()
-        networks_data = self.tab_networks_data.get(current_page, [])
-        self.pygame_draw_networks(networks_data)
-        self.schedule_drawing_area_update()
+        self.request_redraw()
+
+    def on_threshold_changed(self, spin):
+        """Threshold spin handler, filters last scan results without rescanning"""
+        threshold = spin.get_value()
+        with pipeline_stats.stage('table'):
+            for tab_index in self.tab_scan_results:
+                self.apply_threshold(tab_index, threshold)
+        self.request_redraw()
+
+    def apply_threshold(self, tab_index, threshold):
+        """Shows networks of last scan with signal >= threshold on a tab"""
+        networks, negated_signals = self.tab_scan_results[tab_index]
+        count = bisect.bisect_right(negated_signals, -threshold)
+        shown = self.tab_networks_data.get(tab_index)
+        if shown is not None and len(shown) == count:
+            # Same networks, keep the list so renderer caches stay valid
+            return
+
+        filtered_networks = networks[:count]
+        self.update_channels_table(tab_index, filtered_networks)
+        self.tab_networks_data[tab_index] = filtered_networks
+
+    def on_rate_changed(self, combo):
+        """Scan rate dropdown handler"""
+        self.rate_controller.mode = combo.get_active_id()
+        # Apply new rate to the scan that is already waiting, failed scans
+        # keep their backoff
+        if self.scan_timer_id and not self.rate_controller.backoff:
+            waited = time.monotonic() - self.scan_ended
+            self.schedule_next_scan(max(self.rate_controller.next_delay(self.scan_duration) - waited, 0))
+
+    def on_scan_mode_changed(self, combo):
+        """Scan mode dropdown handler"""
+        self.band_scheduler.mode = combo.get_active_id()
+
+    def on_view_mode_toggled(self, button):
+        """Spectrum / waterfall switch handler"""
+        self.request_redraw()
 
     def get_device_bands(self, device_name):
         """Gets information about supported bands for specified device"""
-        bands = set()
+        if device_name == ALL_DEVICES:
+            bands = set()
+            for device in self.wifi_devices:
+                bands |= self.get_device_bands(device)
+            return bands
+        return set(self.get_device_band_frequencies(device_name))
+
+    def get_device_band_frequencies(self, device_name):
+        """Gets {band: [enabled frequencies]} for specified device"""
+        frequencies = self.phy_cache.get(device_name)
+        if frequencies is not None:
+            return frequencies
+
+        frequencies = {}
         try:
-            wiphy = self.device_get_wiphy(device_name)
-            if wiphy is not None:
-                result = subprocess.run(['iw', 'phy', f'phy{wiphy}', 'info'],
-                                        capture_output=True, text=True, timeout=10)
-                if result.returncode == 0:
-                    bands = self.parse_phy_info_results(result.stdout)
+            frequencies = self.backend.get_band_frequencies(device_name)
+            if frequencies:
+                self.phy_cache.put(device_name, frequencies)
         except Exception as e:
-            print(f"get_device_bands() - {e}")
+            print(f"get_device_band_frequencies() - {e}")
             pass
 
-        return bands
+        return frequencies
 
     def device_get_wiphy(self, device_name):
-        """Extracts wiphy value from `iw dev xxx info` output"""
-        result = subprocess.run(['iw', 'dev', device_name, 'info'],
-                              capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if 'wiphy' in line:
-                    return line.split()[-1]
-        return None
-
-    def parse_phy_info_results(self, info_output):
-        """Parses `iw phy phyX info` output"""
-        bands = set()
-        lines = info_output.split('\n')
-        current_band = None
+        """Gets wiphy index of specified device"""
+        return self.backend.get_wiphy(device_name)
 
-        for line in lines:
-            line_strip = line.strip()
-            if line_strip.startswith('Band ') and ':' in line_strip:
-                # We'll determine the actual frequency band when we see the first frequency
-                current_band = "unknown"
-            elif current_band == "unknown" and 'MHz' in line_strip and '[' in line_strip and ']' in line_strip:
-                # Determine the actual band from the first frequency we see
-                if 'disabled' not in line_strip.lower():
-                    # Extract frequency number - format is "* 2412.0 MHz [1]..."
-                    parts = line_strip.split()
-                    for i, part in enumerate(parts):
-                        if part.endswith('MHz'):
-                            # The frequency is in the previous part
-                            if i > 0:
-                                freq_str = parts[i-1]
-                                freq_num = float(freq_str)
-                                current_band = self.get_frequency_band(freq_num)
-
-                                # Add this band to our frequencies dict if it has active channels
-                                if current_band not in bands:
-                                    bands.add(current_band)
-                                break
-        return bands
+    def schedule_next_scan(self, delay):
+        """Schedules scan_wifi_networks() after delay seconds, None cancels it"""
+        if self.scan_timer_id:
+            GLib.source_remove(self.scan_timer_id)
+            self.scan_timer_id = None
+        if delay is not None:
+            self.scan_timer_id = GLib.timeout_add(int(delay * 1000), self.scan_wifi_networks)
 
     def scan_wifi_networks(self):
         """Starts Wi-Fi scanning in separate thread"""
+        self.scan_timer_id = None
         if not self.scanning_enabled:
-            return True  # Continue timer, but scanning is disabled
+            return False  # Don't repeat, scanning is disabled
 
         # Check if scan is already in progress
         if self.scan_in_progress:
-            return True  # Continue timer
+            return False  # Don't repeat, next scan is scheduled when it completes
 
         device_name, band = self.get_current_device_and_band()
         if not device_name or not band:
-            return True  # Continue timer
+            # Tabs may be still loading, try again a bit later
+            self.schedule_next_scan(1)
+            return False
+
+        # Choose bands to scan among tabs that are bands of the device
+        tab_bands = [self.notebook.get_tab_label_text(self.notebook.get_nth_page(i))
+                     for i in range(self.notebook.get_n_pages())]
+        tab_bands = [tab_band for tab_band in tab_bands if tab_band in FREQUENCY_BANDS]
+        bands = self.band_scheduler.next_bands(band, tab_bands)
 
         # Update status bar
         self.status_bar.pop(self.status_context_id)
-        self.status_bar.push(self.status_context_id, f"Scanning {device_name}...")
+        if bands:
+            self.status_bar.push(self.status_context_id, f"Scanning {device_name}, {', '.join(bands)}...")
+        else:
+            self.status_bar.push(self.status_context_id, f"Scanning {device_name}...")
 
         # Start scanning in separate thread
         self.scan_in_progress = True
-        thread = threading.Thread(target=self.scan_thread_proc, args=(device_name,))
+        self.scan_started = time.monotonic()
+        thread = threading.Thread(target=self.scan_thread_proc, args=(device_name, bands))
         thread.daemon = True
         thread.start()
 
-        return True  # Continue timer
+        return False  # Don't repeat, next scan is scheduled when this one completes
 
     def get_current_device_and_band(self):
         """Gets currently selected device and frequency band"""
@@ -501,8 +3573,10 @@ class WirelessExplorer:
         # Get active tab index
         current_page = self.notebook.get_current_page()
 
-        # Get tab name to determine band
+        # Get tab name to determine band, "(loading...)" or "Error" tab isn't one
         tab_label = self.notebook.get_tab_label_text(self.notebook.get_nth_page(current_page))
+        if tab_label not in FREQUENCY_BANDS:
+            return device_name, None
 
         return device_name, tab_label
 
@@ -523,284 +3597,209 @@ class WirelessExplorer:
         selected_bssid = self.get_selected_network_bssid(page)
         self.pygame_draw_networks_with_selection(networks, selected_bssid)
 
-    def pygame_draw_networks_with_selection(self, networks, selected_bssid):
-        self.pygame_surface.fill(self.background_color)
-
-        if not networks:
-            empty_text = self.font.render("List is empty", True, self.foreground_color)
-            text_rect = empty_text.get_rect(center=(self.pygame_width // 2, self.pygame_height // 2))
-            self.pygame_surface.blit(empty_text, text_rect)
+    def pygame_draw_networks_with_selection(self, networks, selected_bssid, page=None):
+        """Asks render thread for a frame, _frame_ready() shows it.
+        With Cairo renderer on_draw draws it instead."""
+        if page is None:
+            page = self.notebook.get_current_page()
+        band = self.notebook.get_tab_label_text(self.notebook.get_nth_page(page))
+        frame_request = FrameRequest(networks, selected_bssid, self.threshold_spin.get_value(),
+                                     self.band_congestion.get(band), band,
+                                     self.waterfall_button.get_active(), self.surface_size)
+        if self.render_thread is None:
+            self.vector_frame = frame_request
+            self.drawing_area.queue_draw()
+            self.redraw_counters['rendered'] += 1
+            return
+        self.latest_generation = self.render_thread.request(frame_request)
+
+    def update_best_channels(self, page=None):
+        """Shows least congested channels of the band on current tab"""
+        if page is None:
+            page = self.notebook.get_current_page()
+        band = self.notebook.get_tab_label_text(self.notebook.get_nth_page(page)) if page >= 0 else None
+        congestion = self.band_congestion.get(band)
+        if congestion is None:
+            self.best_channels_label.set_text("")
+            self.best_channels_label.set_tooltip_text(None)
             return
 
-        # Calculate frequency ranges
-        freq_ranges = []
-        for network in networks:
-            freq = int(network['frequency'])
-            bw = int(network['bandwidth'])
-            freq_ranges.append((freq - bw/2, freq + bw/2, freq))
-
-        # Find overall range
-        min_freq = min(r[0] for r in freq_ranges)
-        max_freq = max(r[1] for r in freq_ranges)
-
-        # Ruler parameters
-        ruler_y = self.pygame_height - 40
-        ruler_left = 25
-        ruler_right = self.pygame_width - 25
-        ruler_width = ruler_right - ruler_left
-
-        # Draw main ruler line
-        pygame.draw.line(self.pygame_surface, self.foreground_color,
-                        (ruler_left, ruler_y), (ruler_right, ruler_y), 2)
+        best = congestion.best_channels()
+        self.best_channels_label.set_text("Best channels: " + ", ".join(str(channel) for channel, _, _, _ in best))
+        self.best_channels_label.set_tooltip_text("\n".join(
+            f"{channel} ({freq} MHz): {overlaps} overlapping, " +
+            ("no signal" if power is None else f"{power:.0f} dBm")
+            for channel, freq, overlaps, power in best))
 
-        # Draw ticks for each network
-        drawn_freqs = set()  # Avoid duplicate labels
-        for _, _, freq in freq_ranges:
-            if freq in drawn_freqs:
+    def get_candidate_frequencies(self, band):
+        """Gets frequencies of a band the selected device(s) can use, empty
+        set if not known yet. Only looks into memory, runs on main thread"""
+        device_name = self.device_combo.get_active_text()
+        devices = self.wifi_devices if device_name == ALL_DEVICES else [device_name]
+        candidates = set()
+        for device in devices:
+            if not device:
                 continue
-            drawn_freqs.add(freq)
-
-            # Calculate position on ruler
-            pos_x = ruler_left + int((freq - min_freq) / (max_freq - min_freq) * ruler_width)
-
-            # Draw tick
-            pygame.draw.line(self.pygame_surface, self.foreground_color,
-                           (pos_x, ruler_y - 10), (pos_x, ruler_y + 10), 2)
-
-            # Draw frequency label
-            freq_text = self.font.render(str(int(freq)), True, self.foreground_color)
-            text_rect = freq_text.get_rect(center=(pos_x, ruler_y + 25))
-            self.pygame_surface.blit(freq_text, text_rect)
-
-        # Get threshold
-        threshold = self.threshold_spin.get_value()
-
-        # Find maximum signal for scaling
-        max_signal = max(int(network['signal']) for network in networks)
-
-        # Calculate maximum trapezoid height
-        font_height = self.font.get_height()
-        ruler_space = 50  # Space for ruler and labels
-        max_tr_height = self.pygame_height - font_height - ruler_space
-
-        # Draw each network, first with weak signals, then with strong ones
-        for i, network in enumerate(reversed(networks)):
-            freq = int(network['frequency'])
-            bw = int(network['bandwidth'])
-            signal = int(network['signal'])
-            ssid = network['ssid']
-
-            # Choose color cyclically. First network in list gets same color,
-            # despite being drawn last
-            color = self.network_colors[(len(networks)-i-1) % len(self.network_colors)]
-
-            # Calculate left and right boundaries
-            left_freq = freq - bw/2
-            right_freq = freq + bw/2
-
-            left_pos = ruler_left + int((left_freq - min_freq) / (max_freq - min_freq) * ruler_width)
-            right_pos = ruler_left + int((right_freq - min_freq) / (max_freq - min_freq) * ruler_width)
-
-            tr_width = max(right_pos - left_pos, 1)  # Minimum 1 pixel
-
-            # Calculate height proportional to signal
-            signal_range = max_signal - threshold
-            if signal_range > 0:
-                tr_height = int((signal - threshold) / signal_range * max_tr_height)
-            else:
-                tr_height = 1
-
-            tr_height = max(tr_height, 1)  # Minimum 1 pixel
-
-            # Calculate trapezoid coordinates
-            top_inset = int(tr_width * 0.1)
-            top_left = left_pos + top_inset
-            top_right = right_pos - top_inset
-
-            # If this is selected network, draw fill
-            if selected_bssid and network.get('bssid') == selected_bssid:
-                # Create semi-transparent surface
-                fill_surface = pygame.Surface((self.pygame_width, self.pygame_height), pygame.SRCALPHA)
-                fill_color = (*color, 80)  # Color with alpha channel (semi-transparency)
-
-                # Draw filled trapezoid
-                trapezoid_points = [
-                    (left_pos, ruler_y),
-                    (top_left, ruler_y - tr_height),
-                    (top_right, ruler_y - tr_height),
-                    (right_pos, ruler_y)
-                ]
-                pygame.draw.polygon(fill_surface, fill_color, trapezoid_points)
-
-                # Blit to main surface
-                self.pygame_surface.blit(fill_surface, (0, 0))
-
-            # Draw trapezoid outline - 3 sides without bottom
-            # Left side
-            pygame.draw.aaline(self.pygame_surface, color,
-                            (left_pos, ruler_y), (top_left, ruler_y - tr_height))
-            # Right side
-            pygame.draw.aaline(self.pygame_surface, color,
-                            (right_pos, ruler_y), (top_right, ruler_y - tr_height))
-            # Top side, narrowed
-            pygame.draw.line(self.pygame_surface, color,
-                            (top_left, ruler_y - tr_height), (top_right, ruler_y - tr_height), 2)
-
-            # Draw SSID above rectangle
-            if ssid != '(hidden)':
-                ssid_text = self.font.render(ssid, True, color, self.background_color)
-                text_center_x = (left_pos + right_pos) // 2
-                text_y = ruler_y - tr_height - font_height - 5
-
-                # Make sure text doesn't go beyond boundaries
-                text_rect = ssid_text.get_rect()
-                text_rect.centerx = text_center_x
-                text_rect.y = max(text_y, 5)  # Minimum 5 pixels from top
+            frequencies = self.phy_cache.get_memory(device)
+            if frequencies is None:
+                return set()  # Unknown device, don't restrict candidates
+            candidates.update(frequencies.get(band, []))
+        return candidates
+
+    def request_redraw(self):
+        """Marks spectrum view dirty, it's rendered once on the next frame
+        no matter how many times this is called before"""
+        self.redraw_counters['requested'] += 1
+        if self.redraw_tick_id:
+            self.redraw_counters['coalesced'] += 1
+            return
+        self.redraw_tick_id = self.drawing_area.add_tick_callback(self.on_redraw_tick)
 
-                self.pygame_surface.blit(ssid_text, text_rect)
+    def on_redraw_tick(self, widget, frame_clock):
+        """Frame clock callback, renders current tab if it's dirty"""
+        self.redraw_tick_id = None
+        current_page = self.notebook.get_current_page()
+        if self.resize_timer_id or current_page < 0:
+            # Surface is about to be recreated, _apply_drawing_area_size()
+            # requests another frame. Or there are no tabs to draw yet.
+            self.redraw_counters['dropped'] += 1
+        else:
+            self.pygame_draw_networks(self.tab_networks_data.get(current_page, []))
+
+        counters = self.redraw_counters
+        tooltip = (f"Redraws requested: {counters['requested']}, rendered: {counters['rendered']}, "
+                   f"coalesced: {counters['coalesced']}, dropped: {counters['dropped']}")
+        text_cache = self.get_text_cache_counters()
+        if text_cache:
+            tooltip += f"\nText cache hits: {text_cache['hits']}, misses: {text_cache['misses']}"
+        self.status_bar.set_tooltip_text(tooltip)
+        return False  # Run once, request_redraw() adds it again
+
+    def _deliver_frame(self, frame, generation):
+        """Called on render thread when a frame is drawn"""
+        GLib.idle_add(self._frame_ready, frame, generation)
+
+    def _frame_ready(self, frame, generation):
+        """Shows frame drawn by render thread, unless newer one was requested since"""
+        if frame is None or generation < self.latest_generation:
+            # Render thread draws the newer one as soon as this one is released
+            self.redraw_counters['dropped'] += 1
+            self.render_thread.frame_shown(self.front_frame[0] if self.front_frame else None)
+            return False  # Don't repeat this GLib.idle_add call
+
+        self.front_frame = frame
+        with pipeline_stats.stage('convert'):
+            self.schedule_drawing_area_update()
+        self.render_thread.frame_shown(frame[0])
+        self.redraw_counters['rendered'] += 1
+        return False  # Don't repeat this GLib.idle_add call
 
     def schedule_drawing_area_update(self):
-        """Converts Surface to GdkPixbuf and schedules drawing_area redraw"""
-        # Get pixel array from pygame surface
-        pygame_array = pygame.surfarray.array3d(self.pygame_surface)
-
-        # PyGame uses (width, height, channels), but GdkPixbuf expects (height, width, channels)
-        pygame_array = numpy.transpose(pygame_array, (1, 0, 2))
-
-        # Add alpha channel (RGBA)
-        height, width, channels = pygame_array.shape
-        rgba_array = numpy.zeros((height, width, 4), dtype=numpy.uint8)
-        rgba_array[:, :, :3] = pygame_array
-        rgba_array[:, :, 3] = 255  # Full opacity
-
-        # Create GdkPixbuf from array
-        self.current_pixbuf = GdkPixbuf.Pixbuf.new_from_data(
-            rgba_array.tobytes(),
-            GdkPixbuf.Colorspace.RGB,
-            True,  # has_alpha
-            8,     # bits_per_sample
-            width,
-            height,
-            width * 4  # rowstride
-        )
+        """Hands shown frame over to Cairo and schedules drawing_area redraw"""
+        # PyGame wrote to the shared buffer behind Cairo's back
+        self.front_frame[0].mark_dirty()
 
         self.drawing_area.queue_draw()
 
-    def scan_thread_proc(self, device_name):
+    def scan_thread_proc(self, device_name, bands=None):
         """Performs scanning in separate thread"""
         try:
-            result = subprocess.run(['iw', 'dev', device_name, 'scan'],
-                                  capture_output=True, text=True, timeout=30)
-
-            if result.returncode == 0:
-                # Parse scan results for all bands
-                networks = self.parse_scan_results(result.stdout)
-                # Safely update UI via GLib.idle_add
-                GLib.idle_add(self._update_scan_results, networks)
-            else:
-                GLib.idle_add(self._scan_completed)
+            devices = self.wifi_devices if device_name == ALL_DEVICES else [device_name]
 
+            # Restrict scan to frequencies of given bands, or scan all bands
+            frequencies = None
+            if bands:
+                frequencies = {}
+                for device in devices:
+                    band_frequencies = self.get_device_band_frequencies(device)
+                    frequencies[device] = [freq for band in bands for freq in band_frequencies.get(band, [])]
+
+            networks = scan_devices(self.backend, devices, self.scan_executor, frequencies)
+            timestamp = get_scan_timestamp(self.backend)
+            if self.scan_log:
+                self.scan_log.append(timestamp, networks)
+            # Safely update UI via GLib.idle_add
+            GLib.idle_add(self._update_scan_results, networks, bands, timestamp)
+        except EndOfScanLog:
+            GLib.idle_add(self._replay_finished)
         except Exception as e:
             print(f"scan_thread_proc() - {e}")
-            GLib.idle_add(self._scan_completed)
-
-    def parse_scan_results(self, scan_output):
-        """Parses `iw scan` results using regex"""
-        networks = []
-
-        # Split into BSS blocks
-        bss_blocks = re.split(r'\nBSS ', scan_output)
-
-        for block in bss_blocks:
-            if not block.strip():
-                continue
-
-            bssid_match = re.search(r'^(?:BSS )?([a-f0-9:]{17})', block)
-            freq_match = re.search(r'freq:\s*(\d+)', block)
-            ssid_match = re.search(r'SSID:\s*(.+)', block)
-            signal_match = re.search(r'signal:\s*(-?\d+).*dBm', block)
-            channel_match = re.search(r'primary channel:\s*(\d+)', block)
-            bw_match = re.search(r'channel width:\s*(\d+)', block)
-
-            frequency = freq_match.group(1).strip() if freq_match else '0'
-
-            network = {
-                'bssid': bssid_match.group(1) if bssid_match else '?',
-                'ssid': ssid_match.group(1).strip() if ssid_match else '(hidden)',
-                'channel': channel_match.group(1) if channel_match else '?',
-                'frequency': frequency,
-                'bandwidth': bw_match.group(1) if bw_match else '20',
-                'signal': signal_match.group(1) if signal_match else '-130'
-            }
-
-            if network['bandwidth'] == '0':
-                # special case: "* channel width: 0 (20 or 40 MHz)"; assume worst
-                network['bandwidth'] = '40'
-            elif network['bandwidth'] == '1':
-                # special case: "* channel width: 1 (80 MHz)"
-                network['bandwidth'] = '80'
-
-            networks.append(network)
-
-        return networks
+            GLib.idle_add(self._scan_completed, e)
 
-    def _update_scan_results(self, networks):
-        """Updates scan results in UI (called from main thread)"""
+    def _update_scan_results(self, networks, bands=None, timestamp=None):
+        """Updates scan results in UI (called from main thread).
+        If bands are given, only their tabs are updated."""
         if not self.scanning_enabled:
-            return
-
-        # Group networks by frequency bands
-        networks_by_band = {'2.4 GHz': [], '5 GHz': [], '6 GHz': []}
-
-        for network in networks:
-            freq = int(network['frequency'])
-            band = self.get_frequency_band(freq)
-            if band:
-                networks_by_band[band].append(network)
+            return self._scan_completed()
 
-        # Get threshold for filtering
+        with pipeline_stats.stage('group'):
+            # Group networks by frequency bands, sorted by descending signal.
+            # Other bands weren't scanned, results for them are stale.
+            networks_by_band = group_networks_by_band(networks, bands)
+            if bands:
+                networks = [network for band_networks in networks_by_band.values() for network in band_networks]
+
+            # Keep history of all networks, including ones below threshold
+            self.signal_history.add_scan(timestamp or time.time(), networks)
+            if self.waterfall is not None:
+                self.render_thread.add_scan(networks_by_band)
+
+            # Rescore channels of scanned bands only, weak networks interfere too
+            for band, band_networks in networks_by_band.items():
+                self.band_congestion[band] = ChannelCongestion(band, band_networks,
+                                                               self.get_candidate_frequencies(band))
+
+            # Keep all networks of tabs for threshold changes
+            updated_tabs = []
+            for tab_index in range(self.notebook.get_n_pages()):
+                tab_label = self.notebook.get_tab_label_text(self.notebook.get_nth_page(tab_index))
+                if tab_label not in networks_by_band:
+                    continue  # Placeholder tab or band that wasn't scanned
+                band_networks = networks_by_band[tab_label]
+                self.tab_scan_results[tab_index] = (band_networks, [-network.signal for network in band_networks])
+                updated_tabs.append(tab_index)
+
+        # Filter by threshold, update tables and save data
         threshold = self.threshold_spin.get_value()
-
-        # Update all tabs
-        for tab_index in range(self.notebook.get_n_pages()):
-            tab_label = self.notebook.get_tab_label_text(self.notebook.get_nth_page(tab_index))
-            band_networks = networks_by_band[tab_label]
-
-            # Sort by descending signal
-            band_networks.sort(key=lambda x: int(x['signal']), reverse=True)
-
-            # Filter by threshold
-            filtered_networks = [network for network in band_networks if int(network['signal']) >= threshold]
-
-            # Update table and save data
-            self.update_channels_table(tab_index, filtered_networks)
-            self.tab_networks_data[tab_index] = filtered_networks
+        with pipeline_stats.stage('table'):
+            for tab_index in updated_tabs:
+                self.tab_networks_data.pop(tab_index, None)
+                self.apply_threshold(tab_index, threshold)
 
         # Update PyGame surface for current active tab
-        current_page = self.notebook.get_current_page()
-        current_networks = self.tab_networks_data.get(current_page, [])
-        self.pygame_draw_networks(current_networks)
-        self.schedule_drawing_area_update()
+        self.request_redraw()
+        self.update_best_channels()
+
+        self._scan_completed()
 
+    def _replay_finished(self):
+        """Stops scanning once scan log is over"""
         self._scan_completed()
+        if self.scanning_enabled:
+            self.on_start_stop_clicked(self.start_button)
+        self.status_bar.pop(self.status_context_id)
+        self.status_bar.push(self.status_context_id, "Replay finished.")
+        return False  # Don't repeat this GLib.idle_add call
 
-    def _scan_completed(self):
-        """Marks scanning as completed"""
+    def _scan_completed(self, error=None):
+        """Marks scanning as completed and schedules the next scan"""
         self.scan_in_progress = False
+        self.scan_ended = time.monotonic()
+        self.scan_duration = self.scan_ended - self.scan_started
+        delay = self.rate_controller.scan_finished(self.scan_duration, error)
+
         # Update status bar
+        msg = "Ready."
+        if error is not None:
+            msg = f"Scan failed, retrying in {delay:.0f} s: {error}"
+        elif self.rate_controller.scans_per_minute() is not None:
+            msg = f"Ready. {self.rate_controller.scans_per_minute():.1f} scans/min"
         self.status_bar.pop(self.status_context_id)
-        self.status_bar.push(self.status_context_id, "Ready.")
-        return False  # Don't repeat this GLib.idle_add call
+        self.status_bar.push(self.status_context_id, msg)
 
-    def get_frequency_band(self, frequency):
-        """Determines frequency band by frequency"""
-        if 2400 <= frequency <= 2500:
-            return "2.4 GHz"
-        elif 5000 <= frequency <= 6000:
-            return "5 GHz"
-        elif 6000 <= frequency <= 7000:
-            return "6 GHz"
-        return None
+        if self.scanning_enabled:
+            self.schedule_next_scan(delay)
+        return False  # Don't repeat this GLib.idle_add call
 
     def update_channels_table(self, tab_index, networks):
         """Updates channel table content on specified tab"""
@@ -810,38 +3809,117 @@ class WirelessExplorer:
         treeview = page.get_child()  # ScrolledWindow -> TreeView
         model = treeview.get_model()
 
-        # Remember selected BSSID before update
-        selected_bssid = None
-        selection = treeview.get_selection()
-        tree_model, model_iter = selection.get_selected()
-        if model_iter and tree_model:
-            selected_bssid = tree_model.get_value(model_iter, 0)  # BSSID in first column
+        # BSSID -> [Gtk.TreeRowReference, row data] of rows already in the table.
+        # Rows are updated in place, so selection and scroll position survive.
+        row_refs = self.tab_row_refs.setdefault(tab_index, {})
 
-        model.clear()
+        new_rows = {}
         for net in networks:
-            row_data = [
-                net['bssid'],
-                net['ssid'],
-                net['channel'],
-                net['frequency'],
-                net['bandwidth'],
-                net['signal'],
+            # Numbers become strings only here, for display
+            new_rows[net.bssid] = [
+                net.bssid,
+                net.ssid,
+                str(net.channel) if net.channel else '?',
+                str(net.frequency),
+                str(net.bandwidth),
+                str(net.signal),
+                net.device,
+                net.signal,
             ]
-            model.append(row_data)
-
-        # Restore selection if network with same BSSID is found
-        if selected_bssid:
-            tree_iter = model.get_iter_first()
-            while tree_iter:
-                if model.get_value(tree_iter, 0) == selected_bssid:
-                    selection.select_iter(tree_iter)
-                    break
-                tree_iter = model.iter_next(tree_iter)
+
+        # Remove networks that disappeared
+        for bssid in [bssid for bssid in row_refs if bssid not in new_rows]:
+            row_ref, _ = row_refs.pop(bssid)
+            model.remove(model.get_iter(row_ref.get_path()))
+
+        for bssid, row_data in new_rows.items():
+            entry = row_refs.get(bssid)
+            if entry is None:
+                # New network, ListStore puts it in place according to signal
+                tree_iter = model.append(row_data)
+                row_refs[bssid] = [Gtk.TreeRowReference.new(model, model.get_path(tree_iter)), row_data]
+                continue
+
+            # Known network, update changed cells only
+            row_ref, old_row_data = entry
+            columns = [i for i in range(len(row_data)) if row_data[i] != old_row_data[i]]
+            if columns:
+                model.set(model.get_iter(row_ref.get_path()), columns, [row_data[i] for i in columns])
+                entry[1] = row_data
 
     def run(self):
         Gtk.main()
 
-app = WirelessExplorer()
-app.run()
-# Keep this! Workaround for https://github.com/pygame/pygame/issues/329
-os._exit(0)
+def main():
+    parser = argparse.ArgumentParser(description="Graphical Wi-Fi scanner for Linux")
+    parser.add_argument('--headless', action='store_true',
+                        help="scan without GUI and write results to stdout or --output")
+    parser.add_argument('-i', '--interface', metavar='DEV',
+                        help="devices to scan in headless mode, comma separated or \"all\" (default: first one found)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl',
+                        help="headless output format (default: jsonl)")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="append headless output to FILE instead of stdout")
+    parser.add_argument('--rate', choices=list(ScanRateController.MODES), default='normal',
+                        help="scan rate: normal, fast (back to back) or low-power (default: normal)")
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                        help="minimal scan period (default: depends on --rate)")
+    parser.add_argument('--bands', metavar='LIST',
+                        help="scan only these bands in headless mode, e.g. 2.4,5 (default: all)")
+    parser.add_argument('--count', type=int, default=0, metavar='N',
+                        help="stop headless mode after N scans (default: run forever)")
+    parser.add_argument('--record', metavar='FILE',
+                        help="append every scan result to FILE")
+    parser.add_argument('--publish', metavar='ADDRESS',
+                        help="in headless mode, stream scans to a collector at unix:PATH or HOST:PORT")
+    parser.add_argument('--sensor-name', default=socket.gethostname(), metavar='NAME',
+                        help="name --publish tags scans with (default: host name)")
+    parser.add_argument('--collect', metavar='ADDRESS',
+                        help="show scans streamed by sensors with --publish, listening on unix:PATH or [HOST]:PORT")
+    parser.add_argument('--renderer', choices=['pygame', 'cairo'], default='pygame',
+                        help="draw spectrum with PyGame on a render thread, or with Cairo vector "
+                             "operations without PyGame and NumPy (default: pygame)")
+    parser.add_argument('--stats-file', metavar='FILE',
+                        help="periodically write timings of scan and drawing stages to FILE as JSON")
+    parser.add_argument('--stats-interval', type=float, default=10.0, metavar='SECONDS',
+                        help="how often to write --stats-file (default: 10)")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="time parsing, grouping and drawing of synthetic scans and exit")
+    parser.add_argument('--benchmark-sizes', default='10,100,1000,10000', metavar='LIST',
+                        help="numbers of BSSes to benchmark with (default: 10,100,1000,10000)")
+    parser.add_argument('--benchmark-save', metavar='FILE',
+                        help="save benchmark results to FILE as a baseline")
+    parser.add_argument('--benchmark-baseline', metavar='FILE',
+                        help="compare with baseline saved by --benchmark-save, exit with 1 if 20%% slower")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="replay scan results recorded with --record instead of scanning")
+    parser.add_argument('--replay-speed', type=float, default=1.0, metavar='X',
+                        help="replay speed relative to recording, 0 for as fast as possible (default: 1)")
+    parser.add_argument('--replay-start', type=float, default=0.0, metavar='SECONDS',
+                        help="start replay this many seconds into the recording")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        return run_benchmark(args)
+
+    if args.headless:
+        if args.replay:
+            backend = ReplayBackend(args.replay, args.replay_speed, args.replay_start)
+        elif args.collect:
+            backend = CollectorBackend(args.collect)
+        else:
+            backend = create_scan_backend()
+        return run_headless(args, backend)
+
+    import_gui_modules(args.renderer)
+    app = WirelessExplorer(record_path=args.record, replay_path=args.replay,
+                           replay_speed=args.replay_speed, replay_start=args.replay_start,
+                           stats_path=args.stats_file, stats_interval=args.stats_interval,
+                           renderer_name=args.renderer, collect_address=args.collect,
+                           rate=args.rate, interval=args.interval)
+    app.run()
+    # Keep this! Workaround for https://github.com/pygame/pygame/issues/329
+    os._exit(0)
+
+if __name__ == '__main__':
+    sys.exit(main())